@@ -1,11 +1,16 @@
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 import os
-from sqlmodel import Session
-from app.database import get_session
-from app.models import User
+import time
+import dataclasses
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session, replica_router
+from app.models import User, Product
+from app.services.auth_cache import token_cache, user_cache, UserSnapshot
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
@@ -18,16 +23,62 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
-    try:
+def decode_access_token(token: str) -> dict:
+    """jwt.decode with a cache in front, so repeat requests skip the HMAC check."""
+    payload = token_cache.get(token)
+    if payload is None:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Never keep claims past the token's own expiry
+        expires_in = payload["exp"] - time.time() if "exp" in payload else None
+        token_cache.set(token, payload, ttl=expires_in)
+    return payload
+
+async def get_user_snapshot(session: AsyncSession, user_id: int) -> UserSnapshot | None:
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = await session.get(User, user_id, options=[selectinload(User.college)])
+        if user is None:
+            return None
+        has_listings = (await session.exec(
+            select(Product.id).where(Product.user_id == user_id).limit(1)
+        )).first() is not None
+        snapshot = UserSnapshot.from_user(user, has_listings)
+        user_cache.set(user_id, snapshot)
+    return snapshot
+
+async def refresh_has_listings(session: AsyncSession, snapshot: UserSnapshot, catalogue_version: int) -> UserSnapshot:
+    """
+    has_listings can go stale on other workers (or after an import) until the
+    snapshot expires. Every listing insert bumps the catalogue version, so a
+    "no listings" snapshot is re-checked once per version it hasn't seen.
+    """
+    if snapshot.has_listings or snapshot.listings_version == catalogue_version:
+        return snapshot
+    has_listings = (await session.exec(
+        select(Product.id).where(Product.user_id == snapshot.id).limit(1)
+    )).first() is not None
+    snapshot = dataclasses.replace(snapshot, has_listings=has_listings, listings_version=catalogue_version)
+    user_cache.set(snapshot.id, snapshot)
+    return snapshot
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session)
+):
+    try:
+        payload = decode_access_token(token)
         user_id = payload.get("user_id")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
         
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
+
+    # Writes go to the primary; keep this user's reads there until replicas catch up
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        replica_router.mark_write(user.id)
     return user
\ No newline at end of file
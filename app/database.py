@@ -1,18 +1,376 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from fastapi import Request
 import os
+import time
+import logging
+import threading
 from dotenv import load_dotenv
+from app.services.metrics import (
+    instrument_engine, POOL_CONNECTS, POOL_CHECKOUTS, POOL_INVALIDATIONS, POOL_CHECKED_OUT, POOL_WAIT,
+)
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional comma separated read replicas, used by get_read_session()
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+# After a user writes, their reads stay on the primary this long (should cover replica lag)
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "10"))
+# A replica that failed to connect is skipped this long before being tried again
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# --- Pool Settings (per uvicorn worker) ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Server-side timeouts in ms, 0 = Postgres default (none)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_LOCK_TIMEOUT_MS = int(os.getenv("DB_LOCK_TIMEOUT_MS", "0"))
+# Behind PgBouncer in transaction mode: no prepared statements, no startup options
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+# Optional total connection budget shared by all workers (e.g. max_connections minus headroom)
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+def to_async_url(url: str) -> str:
+    """Same database, async driver: psycopg 3 for Postgres, aiosqlite for SQLite."""
+    scheme, rest = url.split("://", 1)
+    driver = {
+        "postgres": "postgresql+psycopg",
+        "postgresql": "postgresql+psycopg",
+        "postgresql+psycopg": "postgresql+psycopg",
+        "sqlite": "sqlite+aiosqlite",
+    }.get(scheme, scheme)
+    return f"{driver}://{rest}"
+
+
+class PoolStats:
+    """
+    Counters fed by one engine's pool events (see instrument_pool), read by
+    /internal/db/pool. Also exported to /metrics, labelled with `name`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+        self._connects_metric = POOL_CONNECTS.labels(name)
+        self._checkouts_metric = POOL_CHECKOUTS.labels(name)
+        self._invalidations_metric = POOL_INVALIDATIONS.labels(name)
+        self._checked_out_metric = POOL_CHECKED_OUT.labels(name)
+        self._wait_metric = POOL_WAIT.labels(name)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+        self._connects_metric.inc()
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+        self._checkouts_metric.inc()
+        self._checked_out_metric.inc()
+
+    def record_checkin(self):
+        self._checked_out_metric.dec()
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+        self._invalidations_metric.inc()
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        self._wait_metric.observe(seconds)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "wait_ms_avg": round(self.wait_seconds_total / self.waits * 1000, 3) if self.waits else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            }
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    # Set by instrument_pool()
+    stats: PoolStats | None = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # dispose() swaps in a new pool; the event listeners carry over, keep the stats too
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def instrument_pool(sync_engine, name: str) -> PoolStats:
+    """Feeds a new PoolStats from the engine's pool events."""
+    stats = PoolStats(name)
+    pool = sync_engine.pool
+    if isinstance(pool, TimedQueuePool):
+        pool.stats = stats
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.record_connect()
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record_checkout()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.record_checkin()
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.record_invalidation()
+
+    return stats
+
+
+def pool_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+
+    pool_size, max_overflow = DB_POOL_SIZE, DB_MAX_OVERFLOW
+    if DB_MAX_CONNECTIONS:
+        # Split the budget across workers so N workers can't overrun max_connections
+        budget = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+        pool_size = min(pool_size, budget)
+        max_overflow = min(max_overflow, budget - pool_size)
 
-# Create Engine
-# Note: "check_same_thread": False is only for SQLite. Remove if using PostgreSQL.
-engine = create_engine(DATABASE_URL)
+    connect_args = {}
+    if DB_PGBOUNCER:
+        # Transaction pooling can't keep server-side prepared statements or
+        # startup options; set the timeouts on the PgBouncer side / role instead.
+        connect_args["prepare_threshold"] = None
+    else:
+        options = []
+        if DB_STATEMENT_TIMEOUT_MS:
+            options.append(f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+        if DB_LOCK_TIMEOUT_MS:
+            options.append(f"-c lock_timeout={DB_LOCK_TIMEOUT_MS}")
+        if options:
+            connect_args["options"] = " ".join(options)
+
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+# Create Engines
+# Sync engine: table creation at startup and scripts (e.g. image GC). No pool,
+# so it doesn't hold connections out of the worker's budget.
+engine = create_engine(DATABASE_URL, poolclass=NullPool)
+
+# Async engine: everything served by the API, so DB waits never block the event loop.
+async_engine = create_async_engine(to_async_url(DATABASE_URL), **pool_options(DATABASE_URL))
+
+def use_sqlite_transactions(sync_engine):
+    """
+    pysqlite/aiosqlite only BEGIN before INSERT/UPDATE/DELETE, so a SAVEPOINT
+    issued first acts as the BEGIN and releasing it commits. Open the real
+    transaction just before the first savepoint so begin_nested() nests.
+    (Plain reads stay outside transactions, as the driver intends.)
+    """
+    @event.listens_for(sync_engine, "savepoint")
+    def _begin_before_savepoint(conn, name):
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN")
+
+for _engine in [engine, async_engine.sync_engine]:
+    if _engine.dialect.name == "sqlite":
+        use_sqlite_transactions(_engine)
+    instrument_engine(_engine)
+
+pool_stats = instrument_pool(async_engine.sync_engine, "primary")
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for a read: replicas round-robin, skipping ones that
+    recently failed, and the primary for users who wrote in the last
+    READ_AFTER_WRITE_SECONDS (read-your-writes). Per worker process.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.replicas = [create_async_engine(to_async_url(url), **pool_options(url)) for url in urls]
+        for replica in self.replicas:
+            instrument_engine(replica.sync_engine)
+        self.pool_stats = [instrument_pool(r.sync_engine, f"replica{i}") for i, r in enumerate(self.replicas)]
+        self._next = 0
+        self._down_until = [0.0] * len(self.replicas)
+        self._recent_writes: dict[int, float] = {}
+
+    def mark_write(self, user_id: int):
+        now = time.monotonic()
+        self._recent_writes[user_id] = now + READ_AFTER_WRITE_SECONDS
+        # Drop expired entries now and then so the dict doesn't grow forever
+        if len(self._recent_writes) > 10000:
+            self._recent_writes = {k: v for k, v in self._recent_writes.items() if v > now}
+
+    def is_sticky(self, user_id: int | None) -> bool:
+        return user_id is not None and self._recent_writes.get(user_id, 0.0) > time.monotonic()
+
+    def candidates(self, user_id: int | None = None) -> list:
+        """Replicas to try in order, starting at the round-robin position."""
+        if not self.replicas or self.is_sticky(user_id):
+            return []
+        now = time.monotonic()
+        start = self._next
+        self._next = (self._next + 1) % len(self.replicas)
+        order = [(start + i) % len(self.replicas) for i in range(len(self.replicas))]
+        return [i for i in order if self._down_until[i] <= now]
+
+    def mark_down(self, index: int):
+        self._down_until[index] = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.dispose()
+
+
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+def add_missing_columns(conn, table: str, columns: dict[str, str]):
+    """ALTER TABLE ... ADD COLUMN for each `name: sql type` the table doesn't have yet."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    for name, sql_type in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"))
+
+def create_missing_indexes(conn, model, names: list[str]):
+    """CREATE INDEX IF NOT EXISTS for the model's indexes with these names."""
+    for index in model.__table__.indexes:
+        if index.name in names:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+def upgrade_schema(engine):
+    """
+    create_all() skips tables that already exist, so columns and indexes added
+    to a model later never reach older databases. Each step is idempotent.
+    """
+    from app.models import Product, ProductImage, OTP
+
+    with engine.begin() as conn:
+        # Image variants
+        add_missing_columns(conn, "productimage", {"card_url": "VARCHAR", "thumb_url": "VARCHAR"})
+        add_missing_columns(conn, "productimage", {"width": "INTEGER", "card_width": "INTEGER", "thumb_width": "INTEGER"})
+        # Deduplicated blobs
+        add_missing_columns(conn, "productimage", {"content_hash": "VARCHAR"})
+        create_missing_indexes(conn, ProductImage, ["ix_productimage_content_hash"])
+        # Keyset feed
+        create_missing_indexes(conn, Product, [
+            "ix_product_feed", "ix_product_feed_type", "ix_product_feed_category", "ix_product_feed_city",
+        ])
+        # OTP verify / purge; ix_otp_lookup leads with phone_number, so the
+        # old single column index is redundant
+        create_missing_indexes(conn, OTP, ["ix_otp_lookup", "ix_otp_expires_at"])
+        conn.execute(text("DROP INDEX IF EXISTS ix_otp_phone_number"))
+        # Nearby search (install_geo_index backfills the geohashes)
+        add_missing_columns(conn, "product", {"geohash": "VARCHAR"})
+        create_missing_indexes(conn, Product, ["ix_product_geo"])
 
 def create_db_and_tables():
+    from app.services.search import install_search_index
+    from app.services.college_index import install_trigram_index
+    from app.services.catalogue import install_catalogue_version
+    from app.services.geo import install_geo_index
+
     SQLModel.metadata.create_all(engine)
+    upgrade_schema(engine)
+    install_search_index(engine)
+    install_trigram_index(engine)
+    install_catalogue_version(engine)
+    install_geo_index(engine)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session():
+    # expire_on_commit=False: objects stay readable after commit without a lazy reload
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def request_user_id(request: Request) -> int | None:
+    """User id from the bearer token, if any. Not an auth check (see get_current_user)."""
+    from app.auth import decode_access_token
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_access_token(token).get("user_id")
+    except Exception:
+        return None
+
+async def get_read_session(request: Request):
+    """
+    Session for read-only endpoints. Goes to a replica when configured,
+    otherwise (or when all replicas are down / the user just wrote) to the primary.
+    """
+    for index in replica_router.candidates(request_user_id(request)):
+        session = AsyncSession(replica_router.replicas[index], expire_on_commit=False)
+        try:
+            # Check out a connection now so a dead replica fails over here,
+            # not halfway through the endpoint
+            await session.connection()
+        except (DBAPIError, OSError) as e:
+            await session.close()
+            replica_router.mark_down(index)
+            logger.warning("Replica %d unavailable, skipping for %ss: %s", index, REPLICA_RETRY_SECONDS, e)
+            continue
+        try:
+            yield session
+        finally:
+            await session.close()
+        return
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -1,4 +1,5 @@
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -52,6 +53,17 @@ class Category(SQLModel, table=True):
 
 # --- 3. Products ---
 class Product(SQLModel, table=True):
+    # Composite indexes backing the keyset feed: every filter column sits in
+    # front of (created_at, id) so a page is a single index range scan.
+    __table_args__ = (
+        Index("ix_product_feed", "status", "created_at", "id"),
+        Index("ix_product_feed_type", "status", "product_type", "created_at", "id"),
+        Index("ix_product_feed_category", "status", "category_id", "created_at", "id"),
+        Index("ix_product_feed_city", "status", "city", "created_at", "id"),
+        # Nearby search: geohash prefix ranges (see app/services/geo.py)
+        Index("ix_product_geo", "status", "geohash"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     title: str
     slug: str = Field(unique=True, index=True)
@@ -75,6 +87,8 @@ class Product(SQLModel, table=True):
     state: str | None = None
     latitude: float | None = None
     longitude: float | None = None
+    # Derived from latitude/longitude on write
+    geohash: str | None = None
     
     # Relationships
     category_id: int | None = Field(default=None, foreign_key="category.id")
@@ -88,7 +102,15 @@ class Product(SQLModel, table=True):
 # --- 4. Product Images ---
 class ProductImage(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    url: str
+    url: str  # Full size (1200px)
+    card_url: str | None = None  # 640px, for cards / detail carousels
+    thumb_url: str | None = None  # 320px, for feed thumbnails
+    # Real pixel widths of the variants (portrait / small originals are narrower)
+    width: int | None = None
+    card_width: int | None = None
+    thumb_width: int | None = None
+    # Content key of the stored blobs; rows sharing it share the files (see image_store)
+    content_hash: str | None = Field(default=None, index=True)
     product_id: int = Field(foreign_key="product.id")
     product: Product = Relationship(back_populates="images")
 
@@ -113,8 +135,48 @@ class User(SQLModel, table=True):
     products: List[Product] = Relationship(back_populates="user")
 
 class OTP(SQLModel, table=True):
+    __table_args__ = (
+        # verify_otp: equality on phone/code/is_used, range on expires_at.
+        # Also covers lookups by phone alone.
+        Index("ix_otp_lookup", "phone_number", "code", "is_used", "expires_at"),
+        # Purge job scans by expiry
+        Index("ix_otp_expires_at", "expires_at"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    phone_number: str = Field(index=True)
+    phone_number: str
     code: str
     expires_at: datetime
-    is_used: bool = Field(default=False)
\ No newline at end of file
+    is_used: bool = Field(default=False)
+
+class DeliveryStatus(str, Enum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+# --- OTP Outbox ---
+# Written in the same transaction as the OTP; the delivery queue sends it
+# later and retries, so a restart never loses a code.
+class OTPDelivery(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_otpdelivery_due", "status", "next_attempt_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    otp_id: int = Field(foreign_key="otp.id", index=True)
+    status: DeliveryStatus = Field(default=DeliveryStatus.pending)
+    attempts: int = Field(default=0)
+    # Also the claim lease: a worker pushes it forward while sending
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: str | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: datetime | None = None
+
+
+# --- Catalogue Version ---
+# Single row, bumped on every product write. Feeds conditional GETs (ETag)
+# and the response cache keys, and is shared by all workers via the DB.
+class CatalogueVersion(SQLModel, table=True):
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
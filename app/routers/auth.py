@@ -1,53 +1,53 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from sqlalchemy import text
-from app.database import get_session
-from app.models import User, College
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session
+from app.models import User
 from app.schemas import GoogleLoginRequest, TokenResponse
-from app.utils import verify_google_token, generate_unique_username
+from app.utils import verify_google_token, generate_slug, insert_with_unique_slug
 from app.auth import create_access_token
+from app.services.domain_resolver import domain_resolver
+from app.services.rate_limit import RateLimit
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
-@router.post("/google", response_model=TokenResponse)
-def login_google(request: GoogleLoginRequest, session: Session = Depends(get_session)):
-    google_user = verify_google_token(request.credential)
+# Per client IP; each attempt costs a Google certs check and maybe a user insert
+login_limit = RateLimit("login_ip", "20/minute")
+
+@router.post("/google", response_model=TokenResponse, dependencies=[Depends(login_limit.by_ip)])
+async def login_google(request: GoogleLoginRequest, session: AsyncSession = Depends(get_async_session)):
+    # Blocking HTTP call to Google (certs), keep it off the event loop
+    google_user = await asyncio.to_thread(verify_google_token, request.credential)
     if not google_user:
         raise HTTPException(status_code=400, detail="Invalid Google Token")
 
     email = google_user.get("email")
     domain = email.split("@")[-1]
     
-    user = session.exec(select(User).where(User.email == email)).first()
-    
-    known_college = None 
+    user = (await session.exec(select(User).where(User.email == email))).first()
 
     if not user:
-        # A. Find College (Using SQL LIKE for subdomains)
-        statement = select(College).where(text(f"'{domain}' LIKE '%' || domain"))
-        known_college = session.exec(statement).first()
+        # A. Find College (suffix match, so subdomains resolve too)
+        college_slug = await domain_resolver.resolve(session, domain)
+        is_verified = True if college_slug else False
         
-        college_slug = known_college.slug if known_college else None
-        is_verified = True if known_college else False
-        
-        # B. Generate Unique Username
-        new_username = generate_unique_username(email, session)
-
         user = User(
             email=email,
-            username=new_username,
             name=google_user.get("name"),
             picture=google_user.get("picture"),
             college_slug=college_slug,
             is_college_verified=is_verified
         )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
-    else:
-        # If user exists, load their college for the token slug
-        if user.college_slug:
-            known_college = user.college
+        # B. Unique Username (email prefix, then prefix-2, prefix-3...)
+        try:
+            await insert_with_unique_slug(session, user, "username", generate_slug(email.split("@")[0]))
+            await session.commit()
+        except IntegrityError:
+            # Same account signing in twice at once: the other request created it
+            await session.rollback()
+            user = (await session.exec(select(User).where(User.email == email))).one()
 
     is_onboarded = False
     if user.phone_number and user.gender and user.college_slug:
@@ -1,19 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
-from app.database import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session, get_read_session
 from app.models import College
 from app.schemas import CollegeRead, CollegeCreateRequest
 from app.utils import generate_slug
+from app.services.college_index import college_index
+from app.services.domain_resolver import domain_resolver
+from app.services.catalogue import bump_catalogue_version
+from app.services.response_cache import response_cache
 
 router = APIRouter(prefix="/api/colleges", tags=["colleges"])
 
 @router.post("/", response_model=CollegeRead)
-def create_college(
+async def create_college(
     data: CollegeCreateRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     slug = generate_slug(data.name)
-    if session.exec(select(College).where(College.slug == slug)).first():
+    if (await session.exec(select(College).where(College.slug == slug))).first():
         raise HTTPException(status_code=400, detail="College already exists")
 
     new_college = College(
@@ -25,31 +30,45 @@ def create_college(
         logo_url="https://via.placeholder.com/100" 
     )
     session.add(new_college)
-    session.commit()
-    session.refresh(new_college)
+    # Owners who picked this slug before it existed now get a college in
+    # their product responses
+    await bump_catalogue_version(session)
+    await session.commit()
+    await response_cache.invalidate()
+    await session.refresh(new_college)
+    college_index.add(new_college)
+    domain_resolver.invalidate()
     return new_college
 
 @router.get("/search", response_model=list[CollegeRead])
-def search_colleges(
+async def search_colleges(
     q: str = Query(None, min_length=2),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     if not q:
         return []
-        
+
+    # In-process autocomplete index (prefix + typo tolerant)
+    await college_index.reload_if_stale(session)
+    colleges = college_index.search(q, limit=10)
+    if colleges:
+        return colleges
+
+    # Nothing in this worker's index (e.g. created on another worker since
+    # the last load): ask the DB. On Postgres this hits the pg_trgm indexes.
     # Case insensitive search on Name or City
     statement = select(College).where(
         (College.name.ilike(f"%{q}%")) | 
         (College.city.ilike(f"%{q}%"))
     ).limit(10)
     
-    colleges = session.exec(statement).all()
+    colleges = (await session.exec(statement)).all()
     return colleges
 
 
 @router.get("/{college_slug}", response_model=CollegeRead)
-def get_college_public(college_slug: str, session: Session = Depends(get_session)):
-    college = session.exec(select(College).where(College.slug == college_slug)).first()
+async def get_college_public(college_slug: str, session: AsyncSession = Depends(get_read_session)):
+    college = (await session.exec(select(College).where(College.slug == college_slug))).first()
     if not college:
         raise HTTPException(status_code=404, detail="College not found")
     return college
\ No newline at end of file
@@ -0,0 +1,49 @@
+import os
+import asyncio
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, Response
+from app.services.image_manager import resize_image
+from app.services import image_store
+from app.services.image_executor import image_executor
+from app.services.image_cache import resize_cache
+from app.services.metrics import IMAGE_TIME
+
+router = APIRouter(prefix="/img", tags=["images"])
+
+# Each accepted size is a disk cache entry per image, so only a fixed set is
+# served (stored images are at most 1200px and are never upscaled)
+IMAGE_RESIZE_EDGES = sorted({
+    int(edge) for edge in os.getenv("IMAGE_RESIZE_EDGES", "64,128,256,320,480,640,960,1200").split(",") if edge.strip()
+})
+
+# A key always maps to the same pixels, so resized copies never go stale
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+@router.get("/{width}x{height}/{key}")
+async def get_resized_image(width: int, height: int, key: str):
+    """
+    Serves the stored image `key` scaled to fit inside width x height.
+    Resizes once, then answers from the disk cache.
+    """
+    key = key.removesuffix(".webp")
+    if not image_store.is_valid_key(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if width not in IMAGE_RESIZE_EDGES or height not in IMAGE_RESIZE_EDGES:
+        sizes = ", ".join(str(edge) for edge in IMAGE_RESIZE_EDGES)
+        raise HTTPException(status_code=400, detail=f"Width and height must each be one of: {sizes}.")
+
+    cache_path = resize_cache.path_for(f"{width}x{height}", f"{key}.webp")
+    cached = resize_cache.get(cache_path)
+    if cached:
+        return FileResponse(cached, media_type="image/webp", headers=CACHE_HEADERS)
+
+    source = await asyncio.to_thread(image_store.read_blob, key, "full")
+    if source is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    with IMAGE_TIME.labels("resize").time():
+        resized = await image_executor.run(resize_image, source, width, height)
+    await asyncio.to_thread(resize_cache.put, cache_path, resized)
+
+    return Response(content=resized, media_type="image/webp", headers=CACHE_HEADERS)
@@ -0,0 +1,77 @@
+import os
+import secrets
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import async_engine, pool_stats, replica_router, get_async_session
+from app.services.bulk_import import run_import, iter_records, decode_lines
+from app.services.auth_cache import auth_cache_stats
+from app.services.response_cache import response_cache
+from app.services.otp_queue import otp_queue
+from app.services.otp_purge import otp_purge
+
+# Operational endpoints. Disabled (404) unless INTERNAL_API_TOKEN is set,
+# then callers must send it as X-Internal-Token.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+def require_internal_token(x_internal_token: str | None = Header(None)):
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    dependencies=[Depends(require_internal_token)],
+    include_in_schema=False,
+)
+
+@router.get("/db/pool")
+def get_pool_stats():
+    stats = pool_stats.snapshot(async_engine.sync_engine.pool)
+    stats["replicas"] = {
+        replica_stats.name: replica_stats.snapshot(replica.sync_engine.pool)
+        for replica, replica_stats in zip(replica_router.replicas, replica_router.pool_stats)
+    }
+    return stats
+
+@router.get("/auth-cache")
+def get_auth_cache_stats():
+    return auth_cache_stats()
+
+@router.get("/response-cache")
+def get_response_cache_stats():
+    return response_cache.stats()
+
+@router.get("/otp-queue")
+def get_otp_queue_stats():
+    return otp_queue.stats()
+
+@router.get("/otp-purge")
+def get_otp_purge_stats():
+    return otp_purge.stats()
+
+@router.post("/otp-purge")
+async def run_otp_purge():
+    """Runs a purge now instead of waiting for the next interval."""
+    await otp_purge.run()
+    return otp_purge.stats()
+
+@router.post("/import/{kind}")
+async def bulk_import(
+    kind: Literal["colleges", "products"],
+    request: Request,
+    format: Literal["ndjson", "csv"] | None = Query(None, description="Defaults from Content-Type"),
+    owner: str | None = Query(None, description="Username owning product rows without one"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Streams an NDJSON or CSV body into colleges / products in chunks.
+    Bad lines are reported in `errors` and skipped; the rest are written.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    records = iter_records(decode_lines(request.stream()), format)
+    result = await run_import(session, kind, records, owner)
+    return result.as_dict()
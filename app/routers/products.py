@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
-from sqlmodel import Session, select, SQLModel
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Response, Query
+from sqlmodel import select, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from typing import List, Optional, Callable, Awaitable
+from pydantic import computed_field
 from datetime import datetime
-from jose import jwt, JWTError
-import json
-import random
+from jose import JWTError
+from urllib.parse import urlencode
+import asyncio
 
-from app.database import get_session
+from app.database import get_async_session, get_read_session
 from app.models import Product, ProductImage, Category, User, ProductStatus, ProductType, ProductVisibility
-from app.auth import get_current_user, SECRET_KEY, ALGORITHM
+from app.auth import get_current_user, decode_access_token, get_user_snapshot, refresh_has_listings
+from app.services.auth_cache import UserSnapshot, invalidate_user
+from app.services.response_cache import response_cache, CachedResponse, viewer_segment
+from app.services.serialization import FastJSON
+from app.services.catalogue import get_catalogue_version, bump_catalogue_version, make_etag, validator_headers, is_not_modified, matches_any
 from app.services.image_manager import ImageManager
-from app.utils import generate_slug
+from app.services.visibility import apply_visibility
+from app.services.search import search_terms, build_search_query
+from app.services.geo import (
+    product_geohash, use_earthdistance, build_earthdistance_query, build_candidate_query, haversine_km,
+    GEO_MAX_CANDIDATES,
+)
+from app.utils import generate_slug, insert_with_unique_slug, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
@@ -23,6 +37,30 @@ router = APIRouter(prefix="/api/products", tags=["products"])
 class ProductImageRead(SQLModel):
     id: int
     url: str
+    card_url: Optional[str] = None
+    thumb_url: Optional[str] = None
+    width: Optional[int] = None
+    card_width: Optional[int] = None
+    thumb_width: Optional[int] = None
+
+    @computed_field
+    @property
+    def srcset(self) -> str:
+        # Ready for <img srcset>; older images only have the full size and no
+        # recorded widths (the nominal edge is used then)
+        candidates = [
+            (self.thumb_url, self.thumb_width or 320),
+            (self.card_url, self.card_width or 640),
+            (self.url, self.width or 1200),
+        ]
+        # Small originals give several variants the same width; list it once
+        seen = set()
+        entries = []
+        for url, width in candidates:
+            if url and width not in seen:
+                seen.add(width)
+                entries.append(f"{url} {width}w")
+        return ", ".join(entries)
 
 class CategoryRead(SQLModel):
     id: int
@@ -59,17 +97,29 @@ class ProductRead(SQLModel):
     category: Optional[CategoryRead] = None
     user: Optional[UserRead] = None
 
+class NearbyProductRead(ProductRead):
+    distance_km: float
+
+# Serializers for the catalogue responses (ORM objects in, JSON bytes out).
+# These bypass response_model validation; pass mode="adapter" to go back to pydantic.
+product_json = FastJSON(ProductRead)
+product_list_json = FastJSON(List[ProductRead])
+nearby_list_json = FastJSON(List[NearbyProductRead])
+
+# Largest /nearby radius; bigger circles are a feed, not a "near me"
+NEARBY_MAX_RADIUS_KM = 50
+
 # ==========================================
 # 2. HELPER FUNCTIONS
 # ==========================================
 
 async def get_optional_user(
     request: Request,
-    session: Session = Depends(get_session)
-) -> Optional[User]:
+    session: AsyncSession = Depends(get_read_session)
+) -> Optional[UserSnapshot]:
     """
     Checks for a token in the header. 
-    If present and valid, returns User.
+    If present and valid, returns a (cached) UserSnapshot.
     If missing or invalid, returns None (Guest).
     """
     auth_header = request.headers.get("Authorization")
@@ -81,20 +131,57 @@ async def get_optional_user(
         if scheme.lower() != "bearer":
             return None
             
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id = payload.get("user_id")
         
         if user_id is None:
             return None
             
-        user = session.get(User, user_id)
-        return user
+        return await get_user_snapshot(session, user_id)
         
     except (JWTError, ValueError):
         return None
 
 
-def check_visibility(product: Product, user: Optional[User]) -> bool:
+def canonical_query(request: Request) -> str:
+    """Query string with params sorted, so ?a=1&b=2 and ?b=2&a=1 share a cache entry."""
+    return urlencode(sorted(request.query_params.multi_items()))
+
+
+async def serve_cached(
+    request: Request,
+    session: AsyncSession,
+    current_user: Optional[UserSnapshot],
+    key: str,
+    build: Callable[[], Awaitable[CachedResponse]]
+) -> Response:
+    """
+    Conditional GET + response cache for catalogue reads. The catalogue
+    version goes into the key, so a product write anywhere changes the ETag
+    and misses the cache on every worker. 304s skip the query graph entirely.
+    """
+    version = await get_catalogue_version(session)
+    if current_user is not None:
+        current_user = await refresh_has_listings(session, current_user, version.version)
+    key = f"{key}:v{version.version}:{viewer_segment(current_user)}"
+    headers = validator_headers(make_etag(key), version.updated_at, public=current_user is None)
+    not_modified = is_not_modified(request, headers["ETag"], version.updated_at)
+    if not_modified and not matches_any(request):
+        return Response(status_code=304, headers=headers)
+
+    # `*` only says "if it exists": build first, so a missing slug still 404s
+    response = (await response_cache.get_or_build(key, build)).to_response()
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+def check_visibility(product: Product, user: Optional[UserSnapshot]) -> bool:
+    """
+    Reference implementation of the visibility rules.
+    Endpoints filter in SQL via apply_visibility(); keep the two in sync.
+    """
     # 1. Owner always sees their product
     if user and product.user_id == user.id:
         return True
@@ -121,7 +208,7 @@ def check_visibility(product: Product, user: Optional[User]) -> bool:
         
     # 6. City Visibility
     if product.visibility == ProductVisibility.city:
-        user_city = user.college.city if user.college else None
+        user_city = user.college_city
         target_city = product.city or (product.user.college.city if product.user.college else None)
         
         if user_city and target_city and user_city.lower() == target_city.lower():
@@ -144,71 +231,184 @@ async def create_product(
     visibility: ProductVisibility = Form(ProductVisibility.public),
     is_digital: bool = Form(False),
     city: str = Form(None),
+    latitude: float = Form(None, ge=-90, le=90),
+    longitude: float = Form(None, ge=-180, le=180),
     category_id: int = Form(None),
     new_category_name: str = Form(None),
     files: List[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     if product_type in [ProductType.lost, ProductType.found]:
         price = 0.0
     elif price is None:
         raise HTTPException(status_code=400, detail="Price is required for Buy/Sell/Rent.")
 
+    # Images first: a bad upload should not leave a listing behind
+    stored_images = []
+    if files:
+        if len(files) > 5:
+            raise HTTPException(status_code=400, detail="Max 5 images allowed")
+        for file in files:
+            ImageManager.validate_image(file)
+        # Processed in parallel in the image process pool
+        stored_images = await asyncio.gather(
+            *(ImageManager.save_image(file) for file in files)
+        )
+
+    # Everything below is one transaction: flushes only, a single commit
     final_cat_id = category_id
     if new_category_name:
         cat_slug = generate_slug(new_category_name)
-        existing_cat = session.exec(select(Category).where(Category.slug == cat_slug)).first()
+        existing_cat = (await session.exec(select(Category).where(Category.slug == cat_slug))).first()
         if existing_cat:
             final_cat_id = existing_cat.id
         else:
-            new_cat = Category(name=new_category_name, slug=cat_slug, is_verified=False)
-            session.add(new_cat)
-            session.commit()
-            session.refresh(new_cat)
-            final_cat_id = new_cat.id
-
-    product_slug = generate_slug(title)
-    while session.exec(select(Product).where(Product.slug == product_slug)).first():
-        product_slug += f"-{json.dumps(random.randint(10,99))}"
+            try:
+                async with session.begin_nested():
+                    new_cat = Category(name=new_category_name, slug=cat_slug, is_verified=False)
+                    session.add(new_cat)
+                final_cat_id = new_cat.id
+            except IntegrityError:
+                # Created by a concurrent post in the meantime
+                final_cat_id = (await session.exec(select(Category.id).where(Category.slug == cat_slug))).one()
 
     new_product = Product(
         title=title,
-        slug=product_slug,
         description=description,
         price=price,
         product_type=product_type,
         visibility=visibility, 
         is_digital=is_digital,
         city=city if not is_digital else None,
+        latitude=latitude if not is_digital else None,
+        longitude=longitude if not is_digital else None,
+        geohash=product_geohash(latitude, longitude) if not is_digital else None,
         category_id=final_cat_id,
         user_id=current_user.id,
         status=ProductStatus.active 
     )
-    session.add(new_product)
-    session.commit()
-    session.refresh(new_product)
+    # Slug: title, then title-2, title-3... guarded by the unique constraint
+    await insert_with_unique_slug(session, new_product, "slug", generate_slug(title))
+
+    session.add_all([
+        ProductImage(
+            url=urls["full"],
+            card_url=urls["card"],
+            thumb_url=urls["thumb"],
+            width=widths["full"],
+            card_width=widths["card"],
+            thumb_width=widths["thumb"],
+            content_hash=content_hash,
+            product_id=new_product.id
+        )
+        for content_hash, urls, widths in stored_images
+    ])
+    await bump_catalogue_version(session)
+    await session.commit()
 
-    if files:
-        if len(files) > 5:
-            raise HTTPException(status_code=400, detail="Max 5 images allowed")
-        for file in files:
-            ImageManager.validate_image(file)
-            image_url = await ImageManager.save_image(file, is_local=True)
-            p_img = ProductImage(url=image_url, product_id=new_product.id)
-            session.add(p_img)
-        session.commit()
+    # New listing: cached feeds/details are stale, and the owner now has listings
+    await response_cache.invalidate()
+    invalidate_user(current_user.id)
 
     return {"slug": new_product.slug, "status": new_product.status}
 
 
 @router.get("/", response_model=List[ProductRead])
-def get_products(
-    current_user: Optional[User] = Depends(get_optional_user),
-    session: Session = Depends(get_session)
+async def get_products(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    product_type: Optional[ProductType] = None,
+    category_id: Optional[int] = None,
+    city: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_digital: Optional[bool] = None,
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    session: AsyncSession = Depends(get_read_session)
 ):
+    """
+    Newest-first feed, paginated by (created_at, id).
+    Pass back the X-Next-Cursor response header as ?cursor= to get the next page.
+    """
+    async def build() -> CachedResponse:
+        query = (
+            select(Product)
+            .where(Product.status == ProductStatus.active)
+            .options(
+                selectinload(Product.images),
+                selectinload(Product.category),
+                selectinload(Product.user).selectinload(User.college)
+            )
+        )
+
+        # Filters
+        if product_type is not None:
+            query = query.where(Product.product_type == product_type)
+        if category_id is not None:
+            query = query.where(Product.category_id == category_id)
+        if city:
+            query = query.where(Product.city == city)
+        if min_price is not None:
+            query = query.where(Product.price >= min_price)
+        if max_price is not None:
+            query = query.where(Product.price <= max_price)
+        if is_digital is not None:
+            query = query.where(Product.is_digital == is_digital)
+
+        # Keyset: seek past the last row of the previous page instead of OFFSET
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is None:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            last_created_at, last_id = position
+            # Row-value comparison: with bound parameters SQLite only turns
+            # this form (not the equivalent OR) into an index range seek
+            query = query.where(tuple_(Product.created_at, Product.id) < tuple_(last_created_at, last_id))
+
+        query = apply_visibility(query, current_user)
+        query = query.order_by(Product.created_at.desc(), Product.id.desc()).limit(limit)
+
+        results = (await session.exec(query)).all()
+
+        headers = {}
+        if len(results) == limit:
+            last = results[-1]
+            headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
+        # Privacy Scrubbing
+        if not current_user:
+            for product in results:
+                # We can't modify the ORM object directly if we are strict about types
+                # but SQLModel is flexible.
+                product.user = None
+
+        return CachedResponse(product_list_json.dumps(results), headers)
+
+    # Same segment + same params = same response, so it is cached as bytes
+    key = f"products:list:{canonical_query(request)}"
+    return await serve_cached(request, session, current_user, key, build)
+
+
+@router.get("/search", response_model=List[ProductRead])
+async def search_products(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Ranked full-text search over title + description.
+    The last word is prefix matched, so it works as you type.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return []
+
+    query = build_search_query(session.bind.dialect.name, terms)
     query = (
-        select(Product)
+        query
         .where(Product.status == ProductStatus.active)
         .options(
             selectinload(Product.images),
@@ -216,54 +416,124 @@ def get_products(
             selectinload(Product.user).selectinload(User.college)
         )
     )
-    
-    results = session.exec(query).all()
-    
-    visible_products = []
-    
-    for product in results:
-        if check_visibility(product, current_user):
-            # Privacy Scrubbing
-            if not current_user:
-                # We can't modify the ORM object directly if we are strict about types
-                # but SQLModel is flexible.
-                product.user = None 
-            
-            visible_products.append(product)
-            
-    return visible_products
+    query = apply_visibility(query, current_user).limit(limit)
 
+    results = (await session.exec(query)).all()
 
-@router.get("/{slug}", response_model=ProductRead)
-def get_product_by_slug(
-    slug: str,
-    current_user: Optional[User] = Depends(get_optional_user),
-    session: Session = Depends(get_session)
+    # Privacy Scrubbing
+    if not current_user:
+        for product in results:
+            product.user = None
+
+    return Response(content=product_list_json.dumps(results), media_type="application/json")
+
+
+class _WithDistance:
+    """A Product plus its distance, readable by the NearbyProductRead serializer."""
+
+    def __init__(self, product: Product, distance_km: float):
+        self.product = product
+        self.distance_km = round(distance_km, 3)
+
+    def __getattr__(self, name):
+        return getattr(self.product, name)
+
+
+@router.get("/nearby", response_model=List[NearbyProductRead])
+async def get_nearby_products(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    limit: int = Query(20, ge=1, le=100),
+    product_type: Optional[ProductType] = None,
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    session: AsyncSession = Depends(get_read_session)
 ):
-    query = (
+    """
+    Active listings within `radius_km` of (lat, lng) that the viewer may see,
+    nearest first, with `distance_km`. Listings without coordinates never match.
+    """
+    def filtered(query):
+        query = query.where(Product.status == ProductStatus.active)
+        if product_type is not None:
+            query = query.where(Product.product_type == product_type)
+        return apply_visibility(query, current_user)
+
+    if use_earthdistance(session.bind.dialect.name):
+        # Postgres: GiST earth_box lookup, exact distance and ordering in SQL
+        nearest = (await session.exec(filtered(build_earthdistance_query(lat, lng, radius_km)).limit(limit))).all()
+    else:
+        # Geohash ranges + bounding box in SQL, exact distance here
+        # Capped, so a dense 50km circle doesn't pull every row into Python
+        candidate_query = filtered(build_candidate_query(lat, lng, radius_km)).limit(GEO_MAX_CANDIDATES)
+        candidates = (await session.exec(candidate_query)).all()
+        distances = haversine_km(lat, lng, [c.latitude for c in candidates], [c.longitude for c in candidates])
+        nearest = sorted(
+            ((c.id, d) for c, d in zip(candidates, distances) if d <= radius_km),
+            key=lambda item: (item[1], item[0]),
+        )[:limit]
+
+    distance_by_id = dict(nearest)
+    products = (await session.exec(
         select(Product)
-        .where(Product.slug == slug)
+        .where(Product.id.in_(distance_by_id))
         .options(
             selectinload(Product.images),
             selectinload(Product.category),
             selectinload(Product.user).selectinload(User.college)
         )
-    )
-    
-    product = session.exec(query).first()
-    
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    if not check_visibility(product, current_user):
-        if current_user:
-            raise HTTPException(
-                status_code=403, 
-                detail=f"This product is restricted to {product.visibility} only."
-            )
-        raise HTTPException(status_code=404, detail="Product not found")
+    )).all()
 
+    # Privacy Scrubbing
     if not current_user:
-        product.user = None 
+        for product in products:
+            product.user = None
+
+    results = sorted(
+        (_WithDistance(p, distance_by_id[p.id]) for p in products),
+        key=lambda r: (r.distance_km, r.id),
+    )
+    return Response(content=nearby_list_json.dumps(results), media_type="application/json")
 
-    return product
\ No newline at end of file
+
+@router.get("/{slug}", response_model=ProductRead)
+async def get_product_by_slug(
+    request: Request,
+    slug: str,
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    session: AsyncSession = Depends(get_read_session)
+):
+    # Hot slugs: concurrent misses share one build
+    async def build() -> CachedResponse:
+        query = (
+            select(Product)
+            .where(Product.slug == slug)
+            .options(
+                selectinload(Product.images),
+                selectinload(Product.category),
+                selectinload(Product.user).selectinload(User.college)
+            )
+        )
+        query = apply_visibility(query, current_user)
+    
+        product = (await session.exec(query)).first()
+    
+        if not product:
+            # Hidden or missing. Logged-in users get told which one it is.
+            if current_user:
+                visibility = (await session.exec(
+                    select(Product.visibility).where(Product.slug == slug)
+                )).first()
+                if visibility:
+                    raise HTTPException(
+                        status_code=403, 
+                        detail=f"This product is restricted to {visibility.value} only."
+                    )
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        if not current_user:
+            product.user = None 
+
+        return CachedResponse(product_json.dumps(product))
+
+    return await serve_cached(request, session, current_user, f"products:slug:{slug}", build)
@@ -1,22 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.database import get_session
-from app.models import User
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.database import get_async_session, get_read_session
+from app.models import User, Product
 from app.auth import get_current_user, create_access_token
 from app.schemas import UserRead, OTPRequest, OTPVerifyRequest, UserOnboardingRequest, UpdateProfileRequest
 from app.services.otp import OTPService
+from app.services.auth_cache import invalidate_user
+from app.services.catalogue import bump_catalogue_version
+from app.services.response_cache import response_cache
+from app.services.rate_limit import RateLimit
 
 router = APIRouter(prefix="/api", tags=["users"])
 
+# Every OTP is a DB row and a paid SMS: limit per client IP and per phone number.
+# Verification is limited per user so 6 digit codes can't be brute forced.
+otp_ip_limit = RateLimit("otp_ip", "10/hour")
+otp_phone_limit = RateLimit("otp_phone", "3/10m")
+otp_verify_limit = RateLimit("otp_verify", "10/10m")
+
+async def load_user_read(session: AsyncSession, user_id: int) -> User:
+    # Everything UserRead touches, loaded up front (no lazy loads on an async session)
+    statement = (
+        select(User)
+        .where(User.id == user_id)
+        .options(
+            selectinload(User.college),
+            selectinload(User.products).selectinload(Product.images)
+        )
+        .execution_options(populate_existing=True)
+    )
+    return (await session.exec(statement)).one()
+
 @router.get("/users/me", response_model=UserRead)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await load_user_read(session, current_user.id)
 
 @router.patch("/users/me/complete-profile", response_model=UserRead)
-def complete_profile(
+async def complete_profile(
     update_data: UpdateProfileRequest, 
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     current_user.phone_number = update_data.phone_number
     current_user.gender = update_data.gender
@@ -29,13 +57,19 @@ def complete_profile(
         current_user.is_college_verified = False 
     
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    return current_user
+    # Gender / college decide who sees this user's listings, and product
+    # responses embed the owner: cached catalogue pages are stale
+    await bump_catalogue_version(session)
+    await session.commit()
+    await response_cache.invalidate()
+    invalidate_user(current_user.id)
+    return await load_user_read(session, current_user.id)
 
 @router.get("/u/{username}")
-def get_user_profile(username: str, session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.username == username)).first()
+async def get_user_profile(username: str, session: AsyncSession = Depends(get_read_session)):
+    user = (await session.exec(
+        select(User).where(User.username == username).options(selectinload(User.college))
+    )).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -46,42 +80,45 @@ def get_user_profile(username: str, session: Session = Depends(get_session)):
         "picture": user.picture
     }
 
-@router.post("/users/send-otp")
-def send_otp(
+@router.post("/users/send-otp", dependencies=[Depends(otp_ip_limit.by_ip)])
+async def send_otp(
     data: OTPRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    existing_user = session.exec(select(User).where(User.phone_number == data.phone_number, User.is_phone_verified == True)).first()
+    await otp_phone_limit.check(data.phone_number)
+
+    existing_user = (await session.exec(select(User).where(User.phone_number == data.phone_number, User.is_phone_verified == True))).first()
     if existing_user:
          raise HTTPException(status_code=400, detail="Phone number already in use.")
 
-    OTPService.create_and_send(session, data.phone_number)
+    await OTPService.create_and_send(session, data.phone_number)
     return {"message": "OTP sent successfully"}
 
-@router.post("/users/verify-otp")
-def verify_otp(
+@router.post("/users/verify-otp", dependencies=[Depends(otp_verify_limit.by_user)])
+async def verify_otp(
     data: OTPVerifyRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    is_valid = OTPService.verify_otp(session, data.phone_number, data.code)
+    is_valid = await OTPService.verify_otp(session, data.phone_number, data.code)
     if not is_valid:
         raise HTTPException(status_code=400, detail="Invalid or Expired OTP")
     
     current_user.phone_number = data.phone_number
     current_user.is_phone_verified = True
     session.add(current_user)
-    session.commit()
+    await session.commit()
+    invalidate_user(current_user.id)
     
     return {"message": "Phone verified"}
 
 # --- Onboarding Route ---
 
 @router.patch("/users/onboarding", response_model=dict)
-def complete_onboarding(
+async def complete_onboarding(
     data: UserOnboardingRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     # 1. Check Phone Verification
     if not current_user.is_phone_verified or current_user.phone_number != data.phone_number:
@@ -104,8 +141,12 @@ def complete_onboarding(
              current_user.is_college_verified = False 
 
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    # Same as complete_profile: visibility and the embedded owner changed
+    await bump_catalogue_version(session)
+    await session.commit()
+    await response_cache.invalidate()
+    await session.refresh(current_user)
+    invalidate_user(current_user.id)
 
     # --- 5. REGENERATE TOKEN ---
     is_onboarded = True 
@@ -82,6 +82,11 @@ class ProductBase(BaseModel):
     category_id: int | None = None
     new_category_name: str | None = None
 
+# --- Bulk Import Row (POST /internal/import/products) ---
+class ProductImportRow(ProductBase):
+    # Owner of the listing; falls back to the import's default owner
+    username: str | None = None
+
 class ProductCreateResponse(BaseModel):
     slug: str
     status: str
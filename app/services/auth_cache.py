@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
+
+class TTLCache:
+    """Bounded LRU where every entry also expires after its own TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    What read endpoints need to know about the viewer (visibility rules),
+    without holding an ORM object or a session.
+    """
+    id: int
+    username: str
+    college_slug: str | None
+    gender: str | None
+    college_city: str | None
+    # Owners see their own listings regardless of visibility (response cache segment)
+    has_listings: bool = False
+    # Catalogue version has_listings was last checked against (None: not yet)
+    listings_version: int | None = None
+
+    @classmethod
+    def from_user(cls, user, has_listings: bool = False) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            college_slug=user.college_slug,
+            gender=user.gender,
+            college_city=user.college.city if user.college else None,
+            has_listings=has_listings,
+        )
+
+
+# token -> decoded JWT claims
+token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+# user_id -> UserSnapshot
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def invalidate_user(user_id: int):
+    """Call after changing anything a UserSnapshot holds."""
+    user_cache.pop(user_id)
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
@@ -0,0 +1,427 @@
+import os
+import sys
+import csv
+import json
+import time
+import codecs
+import asyncio
+from datetime import datetime
+from enum import Enum
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import College, Product, Category, User, ProductStatus, ProductType
+from app.schemas import CollegeCreateRequest, ProductImportRow
+from app.utils import generate_slug, highest_suffix
+from app.services.geo import product_geohash
+
+# Rows validated and written per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Only the first N errors are listed in the result (all are counted)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+DEFAULT_LOGO_URL = "https://via.placeholder.com/100"
+
+
+class RowError(Exception):
+    pass
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.inserted / self.seconds) if self.seconds else None,
+        }
+
+
+# ==========================================
+# Parsing: text lines -> (line number, dict)
+# ==========================================
+
+async def decode_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Splits a streamed UTF-8 body into lines without reading it all in."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple[int, dict | RowError]]:
+    """
+    NDJSON: one object per line. CSV: header line, then one record per line
+    (quoted newlines are not supported); empty cells become null.
+    """
+    header = None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        line = line.rstrip("\r")
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, RowError(f"expected {len(header)} columns, got {len(values)}")
+                continue
+            yield line_no, {k: (v if v != "" else None) for k, v in zip(header, values)}
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, RowError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_no, RowError("expected a JSON object")
+                continue
+            yield line_no, record
+
+
+def validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+
+# ==========================================
+# Writing: COPY on Postgres, executemany elsewhere
+# ==========================================
+
+def column_defaults(table) -> dict:
+    """Python-side column defaults (e.g. College.country), which COPY never sees."""
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if default is None or column.primary_key:
+            continue
+        # Callable defaults are wrapped to take an execution context
+        defaults[column.name] = default.arg(None) if default.is_callable else default.arg
+    return defaults
+
+
+async def write_rows(session: AsyncSession, table, rows: list[dict]):
+    if not rows:
+        return
+    connection = await session.connection()
+    if connection.dialect.name != "postgresql":
+        # One statement, executemany over all rows
+        await connection.execute(insert(table), rows)
+        return
+
+    import psycopg
+
+    defaults = column_defaults(table)
+    columns = list(rows[0]) + [name for name in defaults if name not in rows[0]]
+    quote = connection.dialect.identifier_preparer.quote
+    raw = (await connection.get_raw_connection()).driver_connection
+    statement = f"COPY {quote(table.name)} ({', '.join(quote(c) for c in columns)}) FROM STDIN"
+    try:
+        async with raw.cursor() as cursor:
+            async with cursor.copy(statement) as copy:
+                for row in rows:
+                    values = (row[c] if c in row else defaults[c] for c in columns)
+                    # SQLAlchemy stores enums by name
+                    await copy.write_row([v.name if isinstance(v, Enum) else v for v in values])
+    except psycopg.IntegrityError as e:
+        # Raw driver error: give write_chunk the same exception executemany raises
+        raise IntegrityError(statement, None, e) from e
+
+
+async def write_chunk(session: AsyncSession, table, rows: list[tuple[int, dict]], result: ImportResult):
+    """
+    Writes a chunk in one go; if a constraint trips (e.g. a row inserted
+    concurrently), falls back to row by row so only the bad lines fail.
+    """
+    try:
+        async with session.begin_nested():
+            await write_rows(session, table, [row for _, row in rows])
+        result.inserted += len(rows)
+        return
+    except IntegrityError:
+        pass
+
+    for line, row in rows:
+        try:
+            async with session.begin_nested():
+                await write_rows(session, table, [row])
+            result.inserted += 1
+        except IntegrityError as e:
+            result.error(line, f"conflict: {e.orig}")
+
+
+# ==========================================
+# Row preparation per kind
+# ==========================================
+
+class CollegeImporter:
+    table = College.__table__
+
+    def __init__(self, session: AsyncSession, default_owner: str | None = None):
+        self.session = session
+
+    async def prepare(self, records: list[tuple[int, dict]], result: ImportResult) -> list[tuple[int, dict]]:
+        valid = []
+        for line, record in records:
+            try:
+                valid.append((line, CollegeCreateRequest.model_validate(record)))
+            except ValidationError as e:
+                result.error(line, validation_message(e))
+
+        # Duplicates already in the DB, found with two queries for the whole chunk
+        slugs = {generate_slug(row.name) for _, row in valid}
+        domains = {row.domain.lower() for _, row in valid if row.domain}
+        taken_slugs = set((await self.session.exec(select(College.slug).where(College.slug.in_(slugs)))).all())
+        taken_domains = set((await self.session.exec(select(College.domain).where(College.domain.in_(domains)))).all())
+
+        rows = []
+        for line, row in valid:
+            slug = generate_slug(row.name)
+            domain = row.domain.lower() if row.domain else None
+            if slug in taken_slugs:
+                result.error(line, f"college '{slug}' already exists")
+                continue
+            if domain and domain in taken_domains:
+                result.error(line, f"domain '{domain}' already exists")
+                continue
+            taken_slugs.add(slug)
+            if domain:
+                taken_domains.add(domain)
+            rows.append((line, {
+                "name": row.name, "slug": slug, "domain": domain, "city": row.city,
+                "logo_url": DEFAULT_LOGO_URL,
+            }))
+        return rows
+
+    async def finish(self, result: ImportResult):
+        from app.services.catalogue import bump_catalogue_version
+        from app.services.college_index import college_index
+        from app.services.domain_resolver import domain_resolver
+        from app.services.response_cache import response_cache
+
+        if result.inserted:
+            # Product responses embed the owner's college
+            await bump_catalogue_version(self.session)
+            await self.session.commit()
+            await response_cache.invalidate()
+            await college_index.load(self.session)
+            domain_resolver.invalidate()
+
+
+class ProductImporter:
+    table = Product.__table__
+
+    def __init__(self, session: AsyncSession, default_owner: str | None = None):
+        self.session = session
+        self.default_owner = default_owner
+        # Next free suffix per slug base used so far (None: only the bare base
+        # is used), so one import never hands out a slug twice
+        self._next_suffix: dict[str, int | None] = {}
+        self._taken: set[str] = set()
+        # Every slug handed out so far: "Book 2" and the second "Book" both
+        # want book-2, and neither is in the DB until the chunk is written
+        self._used: set[str] = set()
+        # Users who got listings in this import (their snapshots say otherwise)
+        self._owners: set[int] = set()
+
+    async def prepare(self, records: list[tuple[int, dict]], result: ImportResult) -> list[tuple[int, dict]]:
+        valid = []
+        for line, record in records:
+            try:
+                row = ProductImportRow.model_validate(record)
+            except ValidationError as e:
+                result.error(line, validation_message(e))
+                continue
+            if row.product_type not in (ProductType.lost, ProductType.found) and row.price is None:
+                result.error(line, "price: required for buy/sell/rent")
+                continue
+            if not (row.username or self.default_owner):
+                result.error(line, "username: required (no default owner given)")
+                continue
+            valid.append((line, row))
+
+        owners = await self._owner_ids({row.username or self.default_owner for _, row in valid})
+        category_ids = await self._category_ids([row for _, row in valid])
+        # Slug bases already in the DB, one query for the chunk
+        bases = {generate_slug(row.title) for _, row in valid}
+        self._taken = set((await self.session.exec(select(Product.slug).where(Product.slug.in_(bases)))).all())
+
+        rows = []
+        now = datetime.utcnow()
+        for line, row in valid:
+            username = row.username or self.default_owner
+            if username not in owners:
+                result.error(line, f"unknown user '{username}'")
+                continue
+            category_id = category_ids.get(row.category_id or row.new_category_name)
+            if (row.category_id or row.new_category_name) and category_id is None:
+                result.error(line, f"unknown category {row.category_id}")
+                continue
+            rows.append((line, {
+                "title": row.title,
+                "slug": await self._slug(row.title),
+                "description": row.description,
+                "price": 0.0 if row.product_type in (ProductType.lost, ProductType.found) else row.price,
+                "product_type": row.product_type,
+                "status": ProductStatus.active,
+                "visibility": row.visibility,
+                "created_at": now,
+                "is_digital": row.is_digital,
+                "pickup_address": row.pickup_address,
+                "city": row.city if not row.is_digital else None,
+                "state": row.state,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "geohash": product_geohash(row.latitude, row.longitude),
+                "category_id": category_id,
+                "user_id": owners[username],
+            }))
+            self._owners.add(owners[username])
+        return rows
+
+    async def _owner_ids(self, usernames: set[str]) -> dict[str, int]:
+        rows = (await self.session.exec(select(User.username, User.id).where(User.username.in_(usernames)))).all()
+        return dict(rows)
+
+    async def _category_ids(self, rows: list[ProductImportRow]) -> dict:
+        """category_id / new_category_name -> id; new names are created once."""
+        ids = {row.category_id for row in rows if row.category_id}
+        found = {cid: cid for cid in (await self.session.exec(select(Category.id).where(Category.id.in_(ids)))).all()}
+
+        names = {row.new_category_name: generate_slug(row.new_category_name) for row in rows if row.new_category_name and not row.category_id}
+        existing = dict((await self.session.exec(select(Category.slug, Category.id).where(Category.slug.in_(names.values())))).all())
+        for name, slug in names.items():
+            if slug not in existing:
+                try:
+                    async with self.session.begin_nested():
+                        category = Category(name=name, slug=slug, is_verified=False)
+                        self.session.add(category)
+                    existing[slug] = category.id
+                except IntegrityError:
+                    existing[slug] = (await self.session.exec(select(Category.id).where(Category.slug == slug))).one()
+            found[name] = existing[slug]
+        return found
+
+    async def _slug(self, title: str) -> str:
+        """
+        Same scheme as insert_with_unique_slug (base, base-2, ...), but the
+        DB is only asked when a base is already taken or repeats in the import.
+        """
+        base = generate_slug(title)
+        if base not in self._next_suffix and base not in self._taken and base not in self._used:
+            self._next_suffix[base] = None
+            self._used.add(base)
+            return base
+        if self._next_suffix.get(base) is None:
+            _, suffix = await highest_suffix(self.session, Product.slug, base)
+            self._next_suffix[base] = max(suffix, 1) + 1
+        n = self._next_suffix[base]
+        while f"{base}-{n}" in self._used:
+            n += 1
+        self._next_suffix[base] = n + 1
+        self._used.add(f"{base}-{n}")
+        return f"{base}-{n}"
+
+    async def finish(self, result: ImportResult):
+        from app.services.auth_cache import invalidate_user
+        from app.services.catalogue import bump_catalogue_version
+        from app.services.response_cache import response_cache
+
+        if result.inserted:
+            # The bump also makes other workers re-check has_listings
+            await bump_catalogue_version(self.session)
+            await self.session.commit()
+            await response_cache.invalidate()
+            for user_id in self._owners:
+                invalidate_user(user_id)
+
+
+IMPORTERS = {"colleges": CollegeImporter, "products": ProductImporter}
+
+
+async def run_import(
+    session: AsyncSession,
+    kind: str,
+    records: AsyncIterator[tuple[int, dict | RowError]],
+    default_owner: str | None = None,
+) -> ImportResult:
+    """Validates and writes in chunks of IMPORT_CHUNK_SIZE, one commit per chunk."""
+    importer = IMPORTERS[kind](session, default_owner)
+    result = ImportResult()
+    started = time.perf_counter()
+
+    async def flush(chunk: list[tuple[int, dict]]):
+        rows = await importer.prepare(chunk, result)
+        await write_chunk(session, importer.table, rows, result)
+        await session.commit()
+
+    chunk = []
+    async for line, record in records:
+        if isinstance(record, RowError):
+            result.error(line, str(record))
+            continue
+        chunk.append((line, record))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+
+    await importer.finish(result)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+async def _file_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line.rstrip("\n")
+
+
+if __name__ == "__main__":
+    # python -m app.services.bulk_import colleges|products FILE [--owner USERNAME]
+    from app.database import async_engine
+
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in IMPORTERS:
+        sys.exit("usage: python -m app.services.bulk_import colleges|products FILE.ndjson|FILE.csv [--owner USERNAME]")
+
+    kind, path = args[0], args[1]
+    owner = args[args.index("--owner") + 1] if "--owner" in args else None
+    fmt = "csv" if path.endswith(".csv") else "ndjson"
+
+    async def main():
+        with open(path, encoding="utf-8-sig") as f:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                result = await run_import(session, kind, iter_records(_file_lines(f), fmt), owner)
+        await async_engine.dispose()
+        return result
+
+    result = asyncio.run(main())
+    for err in result.as_dict()["errors"]:
+        print(f"line {err['line']}: {err['error']}")
+    summary = result.as_dict()
+    print(f"{summary['inserted']} inserted, {summary['failed']} failed in {summary['seconds']}s ({summary['rows_per_sec']} rows/sec)")
@@ -0,0 +1,78 @@
+import os
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import CatalogueVersion
+
+# Guest responses are public: let browsers / the CDN keep them this long
+CATALOGUE_MAX_AGE = int(os.getenv("CATALOGUE_MAX_AGE", "30"))
+
+
+def install_catalogue_version(engine: Engine):
+    """Seeds the single CatalogueVersion row, so bumps are a plain UPDATE."""
+    with Session(engine) as session:
+        if session.get(CatalogueVersion, 1) is None:
+            session.add(CatalogueVersion(id=1))
+            session.commit()
+
+
+async def get_catalogue_version(session: AsyncSession) -> CatalogueVersion:
+    """Primary key lookup; read from the same session that builds the response."""
+    row = (await session.exec(select(CatalogueVersion).where(CatalogueVersion.id == 1))).first()
+    return row or CatalogueVersion(id=1, version=0, updated_at=datetime(1970, 1, 1))
+
+
+async def bump_catalogue_version(session: AsyncSession):
+    """Call in the same transaction as any product write; the caller commits."""
+    await session.exec(
+        update(CatalogueVersion)
+        .where(CatalogueVersion.id == 1)
+        .values(version=CatalogueVersion.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+def make_etag(key: str) -> str:
+    # Weak: same data, but compression / proxies may change the bytes
+    return 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def validator_headers(etag: str, updated_at: datetime, public: bool) -> dict:
+    return {
+        "ETag": etag,
+        # Stored as naive UTC
+        "Last-Modified": format_datetime(updated_at.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": f"public, max-age={CATALOGUE_MAX_AGE}" if public else "private, no-cache",
+        # Guests and each logged-in segment get different bodies
+        "Vary": "Authorization",
+    }
+
+
+def matches_any(request: Request) -> bool:
+    """If-None-Match: * -- "any current representation", so only true for a resource that exists."""
+    if_none_match = request.headers.get("If-None-Match")
+    return if_none_match is not None and "*" in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def is_not_modified(request: Request, etag: str, updated_at: datetime) -> bool:
+    """RFC 9110: If-None-Match wins over If-Modified-Since when both are sent."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x"
+        return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return updated_at.replace(microsecond=0) <= since
+    return False
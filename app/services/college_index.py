@@ -0,0 +1,288 @@
+import os
+import re
+import asyncio
+import time
+import heapq
+import logging
+from bisect import bisect_left, insort
+from collections import Counter
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import College
+from app.schemas import CollegeRead
+
+logger = logging.getLogger(__name__)
+
+# Rebuild from the DB after this many seconds so colleges created on other
+# workers show up without a restart.
+INDEX_TTL_SECONDS = int(os.getenv("COLLEGE_INDEX_TTL", "300"))
+
+# Bounds on the work one keystroke can do
+# A prefix range this small is scored in full; bigger ones are walked in rank order
+FULL_SCORE_MAX_CANDIDATES = 2000
+# Trigrams shared by more colleges than this ("ins", "col", ...) don't help ranking
+MAX_TRIGRAM_POSTINGS = 5000
+MIN_TRIGRAM_SCORE = 0.3
+
+PG_TRIGRAM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_college_name_trgm ON college USING GIN (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_college_city_trgm ON college USING GIN (city gin_trgm_ops)",
+]
+
+
+def install_trigram_index(engine: Engine):
+    """pg_trgm indexes so the ILIKE fallback in search_colleges is indexed too."""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            for ddl in PG_TRIGRAM_DDL:
+                conn.execute(text(ddl))
+    except Exception as exc:
+        # Managed Postgres may not allow CREATE EXTENSION for the app role
+        logger.warning("pg_trgm indexes not installed: %s", exc)
+
+
+def tokenize(value: str | None) -> list[str]:
+    return re.findall(r"\w+", value.lower()) if value else []
+
+
+def trigrams(token: str) -> set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CollegeIndex:
+    """
+    In-process autocomplete over the College table.
+    Prefix matches come from a sorted word list (bisect) with per-word
+    postings kept in rank order, typos are caught by a trigram index over
+    name words.
+    """
+
+    def __init__(self):
+        self.loaded_at: float | None = None
+        self._colleges: dict[int, CollegeRead] = {}
+        self._names: dict[int, str] = {}
+        self._name_words: dict[int, list[str]] = {}
+        self._words: dict[int, list[str]] = {}
+        # Sorted distinct words; per word, (city only, name length, id) and,
+        # for names starting with that word, (name length, id). All sorted.
+        self._vocab: list[str] = []
+        self._postings: dict[str, list[tuple[int, int, int]]] = {}
+        self._first_words: dict[str, list[tuple[int, int]]] = {}
+        # (lowercase name, id) sorted: names starting with a query are one range
+        self._sorted_names: list[tuple[str, int]] = []
+        self._trigrams: dict[str, list[int]] = {}
+        self._reload_lock = asyncio.Lock()
+        # One list per load() in progress: colleges add()ed meanwhile, which
+        # the index being built may not have read from the DB
+        self._pending_adds: list[list[College]] = []
+
+    @property
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > INDEX_TTL_SECONDS
+
+    async def load(self, session: AsyncSession):
+        added = []
+        self._pending_adds.append(added)
+        try:
+            colleges = (await session.exec(select(College))).all()
+            # Building is CPU work; keep it off the event loop
+            fresh = await asyncio.to_thread(CollegeIndex._build, colleges)
+        finally:
+            self._pending_adds.remove(added)
+        for college in added:
+            if college.id not in fresh._colleges:
+                fresh.add(college)
+
+        # Swap in one go so concurrent searches never see a half-built index.
+        # The lock and other loads' pending adds belong to this object.
+        fresh._reload_lock = self._reload_lock
+        fresh._pending_adds = self._pending_adds
+        self.__dict__.update(fresh.__dict__)
+
+    async def reload_if_stale(self, session: AsyncSession):
+        """
+        One reload at a time once the TTL has passed. Searches arriving while
+        it runs keep using the current index until the new one is swapped in;
+        they only wait when there is no index at all yet.
+        """
+        if not self.is_stale:
+            return
+        if self._reload_lock.locked() and self.loaded_at is not None:
+            return
+        async with self._reload_lock:
+            if self.is_stale:
+                await self.load(session)
+
+    @staticmethod
+    def _build(colleges: list[College]) -> "CollegeIndex":
+        fresh = CollegeIndex()
+        for college in colleges:
+            fresh._insert(college)
+        fresh._vocab.sort()
+        for postings in [fresh._sorted_names, *fresh._postings.values(), *fresh._first_words.values()]:
+            postings.sort()
+        fresh.loaded_at = time.monotonic()
+        return fresh
+
+    def add(self, college: College):
+        """Called after create_college so this worker sees it immediately."""
+        self._insert(college, keep_sorted=True)
+        for added in self._pending_adds:
+            added.append(college)
+
+    def _insert(self, college: College, keep_sorted: bool = False):
+        cid = college.id
+        name_words = tokenize(college.name)
+        city_words = tokenize(college.city)
+
+        self._colleges[cid] = CollegeRead.model_validate(college, from_attributes=True)
+        self._names[cid] = college.name.lower()
+        self._name_words[cid] = name_words
+        self._words[cid] = name_words + city_words
+
+        length = len(self._names[cid])
+        if keep_sorted:
+            insort(self._sorted_names, (self._names[cid], cid))
+        else:
+            self._sorted_names.append((self._names[cid], cid))
+        entries = [(self._postings, word, (int(word not in name_words), length, cid)) for word in set(self._words[cid])]
+        if name_words:
+            entries.append((self._first_words, name_words[0], (length, cid)))
+        for index, word, entry in entries:
+            postings = index.get(word)
+            if postings is None:
+                index[word] = [entry]
+                if index is self._postings:
+                    if keep_sorted:
+                        insort(self._vocab, word)
+                    else:
+                        self._vocab.append(word)
+            elif keep_sorted:
+                insort(postings, entry)
+            else:
+                postings.append(entry)
+
+        for gram in set().union(*(trigrams(w) for w in name_words)):
+            self._trigrams.setdefault(gram, []).append(cid)
+
+    def _prefix_words(self, prefix: str) -> list[str]:
+        start = bisect_left(self._vocab, prefix)
+        # Every word starting with prefix sorts before prefix + U+FFFF
+        end = bisect_left(self._vocab, prefix + "\uffff", lo=start)
+        return self._vocab[start:end]
+
+    def _names_starting_with(self, q: str) -> list[tuple[str, int]]:
+        start = bisect_left(self._sorted_names, (q, -1))
+        end = bisect_left(self._sorted_names, (q + "\uffff", -1), lo=start)
+        return self._sorted_names[start:end]
+
+    def _matches(self, cid: int, terms: list[str]) -> bool:
+        return all(any(w.startswith(t) for w in self._words[cid]) for t in terms)
+
+    def _score_prefix(self, cid: int, q: str, terms: list[str]) -> tuple:
+        name = self._names[cid]
+        # Whole query at the start of the name > every term starts a name word > city hits
+        return (
+            0 if name.startswith(q) else 1,
+            0 if all(any(w.startswith(t) for w in self._name_words[cid]) for t in terms) else 1,
+            len(name),
+        )
+
+    def _ranked_scan(self, ranges: list[list[str]], q: str, terms: list[str], limit: int) -> list[int]:
+        """
+        Exact top `limit` without scoring the whole range: postings are
+        walked in an order where each entry bounds the score of everything
+        after it, and the walk stops once `limit` matches beat that bound.
+        """
+        best: list[tuple[tuple, int]] = []
+
+        def offer(cid: int):
+            if self._matches(cid, terms):
+                insort(best, (self._score_prefix(cid, q, terms), cid))
+                del best[limit:]
+
+        # a) Names starting with the whole query (score (0, 0, length)). Few
+        # of them (usually a multi-word query): all scored. Otherwise their
+        # first word starts with the first term: shortest first.
+        starting = self._names_starting_with(q)
+        if len(starting) <= FULL_SCORE_MAX_CANDIDATES:
+            for _, cid in starting:
+                offer(cid)
+        else:
+            for length, cid in heapq.merge(*(self._first_words[w] for w in ranges[0] if w in self._first_words)):
+                if len(best) == limit and (0, 0, length) > best[-1][0]:
+                    return [cid for _, cid in best]
+                if self._names[cid].startswith(q):
+                    offer(cid)
+        if len(best) == limit:
+            return [cid for _, cid in best]
+
+        # b) Everything else scores (1, city only, length) at best. Walk the
+        # term with the fewest name-word hits: past those, only city hits
+        # are left, shortest first.
+        def name_hits(words: list[str]) -> int:
+            return sum(bisect_left(self._postings[w], (1, -1, -1)) for w in words)
+
+        words = min(ranges, key=name_hits)
+        seen = {cid for _, cid in best}
+        for city_only, length, cid in heapq.merge(*(self._postings[w] for w in words)):
+            if len(best) == limit and (1, city_only, length) > best[-1][0]:
+                break
+            if cid not in seen:
+                seen.add(cid)
+                offer(cid)
+        return [cid for _, cid in best]
+
+    def _prefix_ranked(self, q: str, terms: list[str], limit: int) -> list[int]:
+        """
+        Every term must prefix-match one of the college's words. Exact top
+        `limit` over the whole prefix range, two ways.
+        """
+        ranges = [self._prefix_words(t) for t in terms]
+        sizes = [sum(len(self._postings[w]) for w in words) for words in ranges]
+        rarest = min(range(len(terms)), key=sizes.__getitem__)
+        if sizes[rarest] <= FULL_SCORE_MAX_CANDIDATES:
+            # Small range: score all of it
+            matches = {cid for w in ranges[rarest] for _, _, cid in self._postings[w] if self._matches(cid, terms)}
+            return heapq.nsmallest(limit, matches, key=lambda cid: self._score_prefix(cid, q, terms))
+        return self._ranked_scan(ranges, q, terms, limit)
+
+    def search(self, q: str, limit: int = 10) -> list[CollegeRead]:
+        terms = tokenize(q)
+        if not terms:
+            return []
+        q = " ".join(terms)
+
+        # 1. Prefix matches, ranked
+        ranked = self._prefix_ranked(q, terms, limit)
+
+        # 2. Typo tolerance: top up with trigram-similar names
+        if len(ranked) < limit:
+            shared = Counter()
+            useful_grams = 0
+            for gram in set().union(*(trigrams(t) for t in terms)):
+                postings = self._trigrams.get(gram, ())
+                if 0 < len(postings) <= MAX_TRIGRAM_POSTINGS:
+                    useful_grams += 1
+                    shared.update(postings)
+
+            scored = []
+            for cid, hits in shared.items():
+                if cid in ranked:
+                    continue
+                score = hits / useful_grams
+                if score >= MIN_TRIGRAM_SCORE:
+                    scored.append((-score, len(self._names[cid]), cid))
+            scored.sort()
+            ranked += [cid for _, _, cid in scored[:limit - len(ranked)]]
+
+        return [self._colleges[cid] for cid in ranked]
+
+
+college_index = CollegeIndex()
@@ -0,0 +1,55 @@
+import os
+import time
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import College
+
+# Reload after this many seconds so colleges created on other workers resolve too
+RESOLVER_TTL_SECONDS = int(os.getenv("DOMAIN_RESOLVER_TTL", "300"))
+
+# Key under which a trie node stores the college slug for that suffix
+SLUG = "$"
+
+
+class DomainResolver:
+    """
+    Maps an email domain to a college slug using a trie of reversed labels
+    (in -> ac -> iitb), so cs.iitb.ac.in resolves to iitb.ac.in by walking
+    its labels once, with no DB round trip once loaded.
+    """
+
+    def __init__(self):
+        self._root: dict | None = None
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        self._root = None
+
+    async def load(self, session: AsyncSession):
+        root = {}
+        rows = (await session.exec(select(College.domain, College.slug).where(College.domain != None))).all()
+        for domain, slug in rows:
+            node = root
+            for label in reversed(domain.strip().lower().split(".")):
+                node = node.setdefault(label, {})
+            node[SLUG] = slug
+        self._root = root
+        self._loaded_at = time.monotonic()
+
+    async def resolve(self, session: AsyncSession, domain: str) -> str | None:
+        """Slug of the college with the longest matching domain suffix, or None."""
+        if self._root is None or time.monotonic() - self._loaded_at > RESOLVER_TTL_SECONDS:
+            await self.load(session)
+
+        node = self._root
+        match = None
+        # Only whole labels match: "xiitb.ac.in" is not under "iitb.ac.in"
+        for label in reversed(domain.lower().split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get(SLUG, match)
+        return match
+
+
+domain_resolver = DomainResolver()
@@ -0,0 +1,211 @@
+import os
+import math
+from sqlalchemy import text, func, and_, or_, literal_column
+from sqlalchemy.engine import Engine
+from sqlmodel import select
+from app.models import Product
+
+try:
+    # Optional: refines candidate distances as arrays instead of a Python loop
+    import numpy
+except ImportError:
+    numpy = None
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # ~5m cells, stored per product
+# Most geohash ranges OR-ed into one query; fewer, coarser cells past that
+GEO_MAX_CELLS = int(os.getenv("GEO_MAX_CELLS", "12"))
+# Most candidate rows the geohash path reads per query, nearest first
+GEO_MAX_CANDIDATES = int(os.getenv("GEO_MAX_CANDIDATES", "2000"))
+# "auto" uses earthdistance on Postgres when the extension can be installed,
+# "geohash" always uses the portable geohash + bounding box path
+GEO_BACKEND = os.getenv("GEO_BACKEND", "auto")
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+PG_EARTHDISTANCE_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS cube",
+    "CREATE EXTENSION IF NOT EXISTS earthdistance",
+    "CREATE INDEX IF NOT EXISTS ix_product_earth ON product USING GIST (ll_to_earth(latitude, longitude)) "
+    "WHERE latitude IS NOT NULL AND longitude IS NOT NULL",
+]
+
+# Set by install_geo_index(); None until then (treated as unavailable)
+earthdistance_available: bool | None = None
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def product_geohash(lat: float | None, lng: float | None) -> str | None:
+    """Value for Product.geohash; set it wherever latitude/longitude are written."""
+    if lat is None or lng is None:
+        return None
+    return geohash_encode(lat, lng)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(lat degrees, lng degrees) of a geohash cell."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) around a circle; lng spans all near the poles / antimeridian."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if min_lat <= -90 or max_lat >= 90:
+        return min_lat, max_lat, -180.0, 180.0
+    dlng = math.degrees(radius_km / EARTH_RADIUS_KM / math.cos(math.radians(lat)))
+    if lng - dlng < -180 or lng + dlng > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+def covering_cells(box: tuple[float, float, float, float]) -> list[str]:
+    """
+    Geohash prefixes covering the box: the finest precision that needs at most
+    GEO_MAX_CELLS cells. Empty if even one-character cells would be too many
+    (a huge radius; the bounding box alone filters then).
+    """
+    min_lat, max_lat, min_lng, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = cell_size(precision)
+        rows = math.floor(max_lat / cell_lat) - math.floor(min_lat / cell_lat) + 1
+        cols = math.floor(max_lng / cell_lng) - math.floor(min_lng / cell_lng) + 1
+        if rows * cols > GEO_MAX_CELLS:
+            continue
+        cells = set()
+        for r in range(rows):
+            for c in range(cols):
+                # Sample one point per cell, clamped inside the box
+                cells.add(geohash_encode(
+                    min(max_lat, min_lat + r * cell_lat),
+                    min(max_lng, min_lng + c * cell_lng),
+                    precision,
+                ))
+        return sorted(cells)
+    return []
+
+
+def prefix_range(prefix: str) -> tuple[str, str | None]:
+    """
+    [low, high) bounds of all geohashes starting with `prefix`, so a plain
+    btree index serves it as a range scan (LIKE 'x%' needs special opclasses).
+    """
+    stripped = prefix.rstrip(BASE32[-1])
+    if not stripped:
+        return prefix, None
+    return prefix, stripped[:-1] + BASE32[BASE32.index(stripped[-1]) + 1]
+
+
+def haversine_km(lat: float, lng: float, lats, lngs) -> list[float]:
+    """Distances from (lat, lng) to each point, vectorized when numpy is installed."""
+    if numpy is not None:
+        lat1, lng1 = math.radians(lat), math.radians(lng)
+        lat2, lng2 = numpy.radians(numpy.asarray(lats, dtype=float)), numpy.radians(numpy.asarray(lngs, dtype=float))
+        a = numpy.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * numpy.cos(lat2) * numpy.sin((lng2 - lng1) / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))).tolist()
+
+    lat1, lng1, cos1 = math.radians(lat), math.radians(lng), math.cos(math.radians(lat))
+    distances = []
+    for plat, plng in zip(lats, lngs):
+        lat2 = math.radians(plat)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + cos1 * math.cos(lat2) * math.sin((math.radians(plng) - lng1) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return distances
+
+
+def install_geo_index(engine: Engine):
+    """
+    Backfills product.geohash for rows that got coordinates before the column
+    existed (upgrade_schema adds it and ix_product_geo), and the earthdistance
+    index on Postgres when the extension is available.
+    """
+    global earthdistance_available
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        missing = conn.execute(text(
+            "SELECT id, latitude, longitude FROM product "
+            "WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL"
+        )).all()
+        if missing:
+            conn.execute(
+                text("UPDATE product SET geohash = :geohash WHERE id = :id"),
+                [{"id": id, "geohash": geohash_encode(lat, lng)} for id, lat, lng in missing],
+            )
+
+    earthdistance_available = False
+    if dialect == "postgresql" and GEO_BACKEND == "auto":
+        try:
+            with engine.begin() as conn:
+                for ddl in PG_EARTHDISTANCE_DDL:
+                    conn.execute(text(ddl))
+            earthdistance_available = True
+        except Exception:
+            # contrib modules missing or no privilege: geohash path it is
+            earthdistance_available = False
+
+
+def use_earthdistance(dialect: str) -> bool:
+    return dialect == "postgresql" and GEO_BACKEND == "auto" and bool(earthdistance_available)
+
+
+def build_earthdistance_query(lat: float, lng: float, radius_km: float):
+    """select(Product.id, distance_km) within the radius, nearest first (Postgres + earthdistance)."""
+    here = func.ll_to_earth(lat, lng)
+    there = func.ll_to_earth(Product.latitude, Product.longitude)
+    distance_km = (func.earth_distance(here, there) / 1000).label("distance_km")
+    return (
+        select(Product.id, distance_km)
+        .where(
+            Product.latitude.is_not(None),
+            Product.longitude.is_not(None),
+            # earth_box is a cube around the point: index-assisted, then exact distance
+            func.earth_box(here, radius_km * 1000).op("@>")(there),
+            func.earth_distance(here, there) <= radius_km * 1000,
+        )
+        .order_by(literal_column("distance_km"), Product.id)
+    )
+
+
+def build_candidate_query(lat: float, lng: float, radius_km: float):
+    """
+    select(Product.id, latitude, longitude) inside the geohash cells and
+    bounding box around the circle, roughly nearest first. Callers add
+    .limit(GEO_MAX_CANDIDATES) and refine with haversine_km().
+    """
+    box = bounding_box(lat, lng, radius_km)
+    min_lat, max_lat, min_lng, max_lng = box
+    # Equirectangular distance: plain arithmetic, so any database can sort on
+    # it, and within 50km it orders like haversine but for near ties
+    dlat = Product.latitude - lat
+    dlng = (Product.longitude - lng) * math.cos(math.radians(lat))
+    query = select(Product.id, Product.latitude, Product.longitude).where(
+        Product.latitude.between(min_lat, max_lat),
+        Product.longitude.between(min_lng, max_lng),
+    ).order_by(dlat * dlat + dlng * dlng, Product.id)
+    ranges = []
+    for cell in covering_cells(box):
+        low, high = prefix_range(cell)
+        ranges.append(and_(Product.geohash >= low, Product.geohash < high) if high else Product.geohash >= low)
+    if ranges:
+        query = query.where(or_(*ranges))
+    return query
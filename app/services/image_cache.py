@@ -0,0 +1,71 @@
+import os
+import threading
+from collections import OrderedDict
+
+# On-demand resizes live here, served by /img/{w}x{h}/{key}
+CACHE_DIR = "static/cache/img"
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class DiskLRUCache:
+    """
+    Size-bounded LRU of files under `root`. Recency is tracked in memory
+    and seeded from file mtimes at startup; each worker evicts on its own,
+    so a file can vanish under another worker, which then just rebuilds it.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total += size
+
+    def path_for(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def get(self, path: str) -> str | None:
+        """Returns `path` if cached (and marks it recently used)."""
+        with self._lock:
+            if path in self._entries:
+                if os.path.exists(path):
+                    self._entries.move_to_end(path)
+                    return path
+                self._total -= self._entries.pop(path)
+        return None
+
+    def put(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._total += len(data)
+
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_path, size = self._entries.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+
+
+resize_cache = DiskLRUCache(CACHE_DIR, CACHE_MAX_BYTES)
@@ -0,0 +1,92 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+
+# Pool size / limits (per API worker process)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_MAX_CONCURRENCY = int(os.getenv("IMAGE_MAX_CONCURRENCY", str(IMAGE_WORKERS)))
+IMAGE_MAX_QUEUE = int(os.getenv("IMAGE_MAX_QUEUE", "32"))
+IMAGE_TIMEOUT_SECONDS = float(os.getenv("IMAGE_TIMEOUT_SECONDS", "20"))
+
+
+class ImageExecutor:
+    """
+    Runs CPU-heavy Pillow work in a process pool so it never blocks the
+    event loop. At most IMAGE_MAX_CONCURRENCY jobs run at once and at most
+    IMAGE_MAX_QUEUE wait behind them; past that, uploads get a 503.
+    """
+
+    def __init__(self):
+        self._pool: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._waiting = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop + threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(IMAGE_MAX_CONCURRENCY)
+
+        # Backpressure: refuse instead of queueing without bound
+        if self._waiting >= IMAGE_MAX_QUEUE:
+            raise HTTPException(
+                status_code=503,
+                detail="Image processing is busy, try again shortly.",
+                headers={"Retry-After": "5"},
+            )
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        future = None
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._get_pool(), fn, *args)
+            # Unlike wait_for, asyncio.wait leaves the job alone on timeout
+            done, _ = await asyncio.wait({future}, timeout=IMAGE_TIMEOUT_SECONDS)
+            if not done:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Image processing timed out.",
+                    headers={"Retry-After": "5"},
+                )
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a hostile image): start a fresh pool
+            self.shutdown()
+            raise HTTPException(status_code=500, detail="Image processing failed.")
+        finally:
+            if future is None or future.done():
+                self._slots.release()
+            else:
+                # Timed out or the request went away, but a pool worker can't
+                # be interrupted: the slot stays taken until the job finishes,
+                # so IMAGE_MAX_CONCURRENCY really bounds the work in flight
+                future.add_done_callback(self._release_when_done)
+
+    def _release_when_done(self, future: asyncio.Future):
+        if not future.cancelled():
+            # Nobody awaits it any more; retrieve the error so it isn't logged as unhandled
+            future.exception()
+        self._slots.release()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_executor = ImageExecutor()
@@ -1,12 +1,100 @@
 import os
+import io
+import asyncio
 from PIL import Image
 from fastapi import UploadFile, HTTPException
-import uuid
-import shutil
+from app.services.image_executor import image_executor
+from app.services import image_store
+from app.services.metrics import IMAGE_TIME
+
+# Longest edge of each stored variant. "full" keeps the plain <key>.webp name.
+VARIANTS = {"full": 1200, "card": 640, "thumb": 320}
+
+# Uploads above this many pixels are rejected from the header, before decoding
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+class ImageRejected(ValueError):
+    """Raised inside the worker process; turned into a 400 by save_image."""
+
+
+def fit(size: tuple[int, int], edge: int) -> tuple[int, int]:
+    """Size of a variant: scaled to fit edge x edge, never upscaled."""
+    width, height = size
+    scale = min(1.0, edge / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def variant_widths(data: bytes) -> dict[str, int]:
+    """Pixel width of each variant process_image() makes from `data` (reads the header only)."""
+    size = Image.open(io.BytesIO(data)).size
+    return {name: fit(size, edge)[0] for name, edge in VARIANTS.items()}
+
+
+def process_image(data: bytes) -> dict[str, bytes]:
+    """
+    Decode, check and re-encode one upload as a WebP per VARIANTS entry.
+    Runs in the image process pool, so it must stay a top-level function.
+    """
+    # 1. Open Image with Pillow (reads the header only)
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ImageRejected("Image resolution too large.")
+    except Exception:
+        raise ImageRejected("Invalid image file.")
+
+    # Pixel budget, checked before anything is decoded
+    if img.width * img.height > IMAGE_MAX_PIXELS:
+        raise ImageRejected("Image resolution too large.")
+    # Variant sizes come from the original size, not the draft-reduced one,
+    # so they match variant_widths()
+    original_size = img.size
+
+    # JPEG: let libjpeg decode straight at 1/2, 1/4 or 1/8 scale, as long as
+    # the result still covers the largest variant. No-op for other formats.
+    largest = max(VARIANTS.values())
+    img.draft("RGB", (largest, largest))
+
+    # Single decode; a corrupt or truncated file fails here (no verify() + re-open)
+    try:
+        img.load()
+    except Exception:
+        raise ImageRejected("Invalid image file.")
+
+    # 2. Check NSFW
+    if ImageManager.is_nsfw(img):
+        raise ImageRejected("Inappropriate image detected.")
+
+    # 3. Compress / Resize
+    # Convert to RGB (handles PNG transparency, palette and CMYK images)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Largest first, each variant is downscaled from the previous one
+    encoded = {}
+    for name, edge in VARIANTS.items():
+        size = fit(original_size, edge)
+        if img.size != size:
+            img = img.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+        encoded[name] = encode_webp(img)
+    return encoded
+
+
+def resize_image(data: bytes, width: int, height: int) -> bytes:
+    """Fit a stored WebP inside width x height (never upscales). Runs in the pool."""
+    img = Image.open(io.BytesIO(data))
+    img.thumbnail((width, height))
+    return encode_webp(img)
+
+
+def encode_webp(img: Image.Image) -> bytes:
+    # Save as optimized WebP
+    out = io.BytesIO()
+    img.save(out, "WEBP", quality=80)
+    return out.getvalue()
 
-# Configure where to save local images
-UPLOAD_DIR = "static/uploads/products"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 class ImageManager:
     @staticmethod
@@ -14,7 +102,7 @@ class ImageManager:
         # 1. Check content type
         if file.content_type not in ["image/jpeg", "image/png", "image/webp"]:
             raise HTTPException(status_code=400, detail="Invalid image format. Use JPEG, PNG, or WebP.")
-        
+
         # 2. Check File Size (Limit to 5MB)
         file.file.seek(0, 2)
         size = file.file.tell()
@@ -26,41 +114,36 @@ class ImageManager:
     def is_nsfw(image: Image.Image) -> bool:
         # Placeholder for NSFW logic.
         # In future, call an external API or use a library like 'nsfw-detector'
-        return False 
+        return False
+
+    @staticmethod
+    async def save_image(file: UploadFile) -> tuple[str, dict[str, str], dict[str, int]]:
+        """
+        Stores every variant under the upload's content key, in whatever
+        storage backend is configured (local disk or S3).
+        Returns (key, {"full": url, "card": url, "thumb": url}, {variant: pixel width}).
+        """
+        data = await file.read()
+        key = image_store.content_key(data)
+
+        # Same bytes uploaded before (relist, retry): reuse, skip the encode
+        if not await asyncio.to_thread(image_store.touch_blobs, key):
+            encoded = await ImageManager._encode(data)
+            # Variants go up concurrently
+            await asyncio.gather(*(
+                asyncio.to_thread(image_store.write_blob, key, name, blob)
+                for name, blob in encoded.items()
+            ))
+
+        # From the header, so dedupe hits (no encode) get them too
+        widths = await asyncio.to_thread(variant_widths, data)
+        return key, {name: image_store.blob_url(key, name) for name in VARIANTS}, widths
 
     @staticmethod
-    async def save_image(file: UploadFile, is_local: bool = True) -> str:
-        # 1. Open Image with Pillow
+    async def _encode(data: bytes) -> dict[str, bytes]:
+        # Pillow work happens in the process pool, off the event loop
         try:
-            img = Image.open(file.file)
-            img.verify() # Verify it's not corrupt
-            file.file.seek(0)
-            img = Image.open(file.file) # Re-open for processing
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid image file.")
-
-        # 2. Check NSFW
-        if ImageManager.is_nsfw(img):
-            raise HTTPException(status_code=400, detail="Inappropriate image detected.")
-
-        # 3. Compress / Resize
-        # Convert to RGB (handles PNG transparency issues)
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        
-        # Resize if massive (e.g., max width 1200px)
-        img.thumbnail((1200, 1200)) 
-
-        # 4. Generate Filename
-        filename = f"{uuid.uuid4()}.webp"
-        
-        if is_local:
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            # Save as optimized WebP
-            img.save(file_path, "WEBP", quality=80)
-            
-            # Return URL (Assuming you mount /static in main.py)
-            return f"/static/uploads/products/{filename}"
-        else:
-            # AWS S3 Logic would go here
-            return "https://s3.aws.com/..."
\ No newline at end of file
+            with IMAGE_TIME.labels("encode").time():
+                return await image_executor.run(process_image, data)
+        except ImageRejected as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
@@ -0,0 +1,104 @@
+import re
+import sys
+import time
+import hashlib
+from sqlmodel import Session, select
+from app.models import ProductImage
+from app.services.storage import create_storage
+
+# Configure where to save local images (STORAGE_BACKEND=local)
+UPLOAD_DIR = "static/uploads/products"
+UPLOAD_URL = "/static/uploads/products"
+
+storage = create_storage(UPLOAD_DIR, UPLOAD_URL)
+
+VARIANT_NAMES = ("full", "card", "thumb")
+
+# Content keys are sha256 hex digests; older uploads used uuid4 keys
+CONTENT_KEY = re.compile(r"^[0-9a-f]{64}$")
+LEGACY_KEY = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+BLOB_NAME = re.compile(r"^(?P<key>[0-9a-f]{64})(_[a-z]+)?\.webp$")
+
+
+def content_key(data: bytes) -> str:
+    """Key for an upload: hash of the raw bytes, so re-uploads map to the same blobs."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(CONTENT_KEY.match(key) or LEGACY_KEY.match(key))
+
+
+def blob_name(key: str, variant: str) -> str:
+    """
+    Storage name of a variant (path relative to UPLOAD_DIR when local).
+    Content keys are sharded two levels deep (ab/cd/<key>.webp) to keep
+    directories small; legacy uuid keys live flat in UPLOAD_DIR.
+    """
+    filename = f"{key}.webp" if variant == "full" else f"{key}_{variant}.webp"
+    if CONTENT_KEY.match(key):
+        return f"{key[:2]}/{key[2:4]}/{filename}"
+    return filename
+
+
+def blob_url(key: str, variant: str) -> str:
+    return storage.url(blob_name(key, variant))
+
+
+def touch_blobs(key: str) -> bool:
+    """
+    Reuses an earlier upload's blobs: bumps their modified time so the
+    collect_garbage() grace window covers the new, not yet committed
+    reference. False if any variant is missing (store them again then).
+    """
+    return all(storage.touch(blob_name(key, variant)) for variant in VARIANT_NAMES)
+
+
+def read_blob(key: str, variant: str) -> bytes | None:
+    return storage.get(blob_name(key, variant))
+
+
+def write_blob(key: str, variant: str, data: bytes):
+    storage.put(blob_name(key, variant), data)
+
+
+def collect_garbage(session: Session, grace_seconds: int = 3600, dry_run: bool = False) -> list[str]:
+    """
+    Deletes content-addressed blobs that no ProductImage references.
+    Blobs younger than `grace_seconds` are kept: their upload may still be
+    in flight, with the ProductImage row not committed yet.
+    """
+    referenced = set(session.exec(
+        select(ProductImage.content_hash).where(ProductImage.content_hash != None).distinct()
+    ).all())
+    cutoff = time.time() - grace_seconds
+
+    removed = []
+    for name, modified in storage.list():
+        match = BLOB_NAME.match(name.rsplit("/", 1)[-1])
+        if not match or match["key"] in referenced:
+            continue
+        if modified.timestamp() > cutoff:
+            continue
+        removed.append(name)
+        if not dry_run:
+            storage.delete(name)
+    return removed
+
+
+if __name__ == "__main__":
+    # python -m app.services.image_store gc [--dry-run] [--grace-hours N]
+    from app.database import engine
+
+    args = sys.argv[1:]
+    if not args or args[0] != "gc":
+        sys.exit("usage: python -m app.services.image_store gc [--dry-run] [--grace-hours N]")
+
+    grace_hours = float(args[args.index("--grace-hours") + 1]) if "--grace-hours" in args else 1
+    dry_run = "--dry-run" in args
+
+    with Session(engine) as session:
+        removed = collect_garbage(session, int(grace_hours * 3600), dry_run)
+    for name in removed:
+        print(("would remove " if dry_run else "removed ") + name)
+    print(f"{len(removed)} orphaned blob(s)")
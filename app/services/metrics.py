@@ -0,0 +1,144 @@
+import os
+import time
+import collections
+from contextvars import ContextVar
+from sqlalchemy import event
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+
+# Set to false to skip the middleware entirely (the /metrics endpoint stays)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Several uvicorn workers: point this at an empty shared directory so /metrics
+# adds up all workers (prometheus_client multiprocess mode)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Catalogue reads are ~ms, uploads run into seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LABELS = ("method", "route")
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", LABELS + ("status",))
+LATENCY = Histogram("http_request_duration_seconds", "Request latency", LABELS, buckets=LATENCY_BUCKETS)
+# By method only: the route is known once the router has run, after the request started
+IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being served", ("method",), multiprocess_mode="livesum")
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size", LABELS, buckets=SIZE_BUCKETS)
+DB_TIME = Histogram("http_request_db_seconds", "Time spent in SQL per request", LABELS, buckets=LATENCY_BUCKETS)
+DB_QUERIES = Histogram("http_request_db_queries", "SQL statements per request", LABELS, buckets=QUERY_COUNT_BUCKETS)
+IMAGE_TIME = Histogram("image_processing_seconds", "Image decode / resize / encode time", ("operation",), buckets=LATENCY_BUCKETS)
+# Connection pools, one series per engine ("primary", "replica0", ...); fed by PoolStats
+POOL_CONNECTS = Counter("db_pool_connects_total", "New database connections", ("pool",))
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Pool checkouts", ("pool",))
+POOL_INVALIDATIONS = Counter("db_pool_invalidations_total", "Invalidated connections", ("pool",))
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", ("pool",), multiprocess_mode="livesum")
+POOL_WAIT = Histogram("db_pool_wait_seconds", "Wait for a pool connection", ("pool",), buckets=LATENCY_BUCKETS)
+
+UNMATCHED = "<unmatched>"
+
+
+class RequestStats:
+    """Per-request counters; engine events add to the one in the current context."""
+
+    __slots__ = ("db_seconds", "db_queries", "statements")
+
+    def __init__(self, record_statements: bool = False):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        # SQL text -> executions, only when profiling (see query_profiler)
+        self.statements: collections.Counter | None = collections.Counter() if record_statements else None
+
+    def record(self, statement: str, seconds: float):
+        self.db_seconds += seconds
+        self.db_queries += 1
+        if self.statements is not None:
+            self.statements[statement] += 1
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(sync_engine):
+    """Times every statement on the engine into the current request's RequestStats."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = request_stats.get()
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - context._query_started)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task per request). Labels use
+    the route template the router matched (/api/products/{slug}), never the
+    raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # labels() takes a lock and builds a key each time; keep the children
+        self._series: dict[tuple, tuple] = {}
+
+    def series(self, method: str, route: str, status: str) -> tuple:
+        key = (method, route, status)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = (
+                REQUESTS.labels(method, route, status),
+                LATENCY.labels(method, route),
+                RESPONSE_SIZE.labels(method, route),
+                DB_TIME.labels(method, route),
+                DB_QUERIES.labels(method, route),
+            )
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        in_progress = IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            request_stats.reset(token)
+            # Set by the router on the shared scope; missing for 404s
+            route = getattr(scope.get("route"), "path", UNMATCHED)
+            requests, latency, response_size, db_time, db_queries = self.series(method, route, str(status))
+            requests.inc()
+            latency.observe(elapsed)
+            response_size.observe(size)
+            db_time.observe(stats.db_seconds)
+            db_queries.observe(stats.db_queries)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """(body, content type) for /metrics."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,7 +1,9 @@
 import random
 from datetime import datetime, timedelta
-from sqlmodel import Session, select
-from app.models import OTP, User
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import OTP, OTPDelivery
+from app.services.otp_queue import otp_queue
 
 class OTPService:
     @staticmethod
@@ -9,42 +11,39 @@ class OTPService:
         return str(random.randint(100000, 999999))
 
     @staticmethod
-    def send_otp(phone_number: str, code: str):
-        # TODO: Integrate Twilio, SNS, or MSG91 here
-        print(f"========================================")
-        print(f" [SMS MOCK] To: {phone_number} | Code: {code}")
-        print(f"========================================")
-        return True
-
-    @staticmethod
-    def create_and_send(session: Session, phone_number: str):
+    async def create_and_send(session: AsyncSession, phone_number: str):
         # 1. Generate
         code = OTPService.generate_otp()
         expires = datetime.utcnow() + timedelta(minutes=10)
         
-        # 2. Save to DB
+        # 2. Save to DB, with its outbox row in the same transaction
         otp_entry = OTP(phone_number=phone_number, code=code, expires_at=expires)
         session.add(otp_entry)
-        session.commit()
+        await session.flush()
+        delivery = OTPDelivery(otp_id=otp_entry.id)
+        session.add(delivery)
+        await session.commit()
         
-        # 3. Send
-        OTPService.send_otp(phone_number, code)
+        # 3. Send in the background (app/services/otp_queue.py), so the
+        # request never waits on the SMS gateway
+        otp_queue.enqueue(delivery.id)
         return True
 
     @staticmethod
-    def verify_otp(session: Session, phone_number: str, code: str) -> bool:
-        # Find valid, unused OTP
-        statement = select(OTP).where(
-            OTP.phone_number == phone_number,
-            OTP.code == code,
-            OTP.is_used == False,
-            OTP.expires_at > datetime.utcnow()
+    async def verify_otp(session: AsyncSession, phone_number: str, code: str) -> bool:
+        # Find and consume a valid, unused OTP in one statement. Two concurrent
+        # verifies can't both succeed: the second sees is_used already set.
+        statement = (
+            update(OTP)
+            .where(
+                OTP.phone_number == phone_number,
+                OTP.code == code,
+                OTP.is_used == False,
+                OTP.expires_at > datetime.utcnow()
+            )
+            .values(is_used=True)
+            .returning(OTP.id)
         )
-        otp_entry = session.exec(statement).first()
-        
-        if otp_entry:
-            otp_entry.is_used = True
-            session.add(otp_entry)
-            session.commit()
-            return True
-        return False
\ No newline at end of file
+        consumed = (await session.exec(statement)).first()
+        await session.commit()
+        return consumed is not None
@@ -0,0 +1,117 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import async_engine
+from app.models import OTP, OTPDelivery
+
+logger = logging.getLogger(__name__)
+
+# Rows are kept this long past expiry (handy when debugging a user's "no code" report)
+OTP_RETENTION_MINUTES = int(os.getenv("OTP_RETENTION_MINUTES", "60"))
+OTP_PURGE_INTERVAL_SECONDS = float(os.getenv("OTP_PURGE_INTERVAL_SECONDS", "600"))
+# Each batch is its own short transaction; pause between them so other writers get in
+OTP_PURGE_BATCH_SIZE = int(os.getenv("OTP_PURGE_BATCH_SIZE", "1000"))
+OTP_PURGE_PAUSE_SECONDS = float(os.getenv("OTP_PURGE_PAUSE_MS", "50")) / 1000
+
+
+class OTPPurgeJob:
+    """
+    Deletes OTP rows (and their outbox rows) that expired more than
+    OTP_RETENTION_MINUTES ago, OTP_PURGE_BATCH_SIZE at a time, every
+    OTP_PURGE_INTERVAL_SECONDS. Running in several workers is harmless:
+    on Postgres each batch skips rows another worker has locked.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.purged_total = 0
+        self.last_purged = 0
+        self.last_run_at: datetime | None = None
+        self.last_duration_ms = 0.0
+        self.table_rows: int | None = None
+        self.table_bytes: int | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("OTP purge failed")
+            await asyncio.sleep(OTP_PURGE_INTERVAL_SECONDS)
+
+    async def run(self) -> int:
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(minutes=OTP_RETENTION_MINUTES)
+        purged = 0
+        async with AsyncSession(async_engine) as session:
+            while True:
+                batch = await self.purge_batch(session, cutoff)
+                purged += batch
+                if batch < OTP_PURGE_BATCH_SIZE:
+                    break
+                await asyncio.sleep(OTP_PURGE_PAUSE_SECONDS)
+            self.table_rows, self.table_bytes = await table_size(session)
+
+        self.runs += 1
+        self.last_purged = purged
+        self.purged_total += purged
+        self.last_run_at = datetime.utcnow()
+        self.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        if purged:
+            logger.info("Purged %d expired OTPs in %.0f ms", purged, self.last_duration_ms)
+        return purged
+
+    @staticmethod
+    async def purge_batch(session: AsyncSession, cutoff: datetime) -> int:
+        ids = (await session.exec(
+            select(OTP.id)
+            .where(OTP.expires_at < cutoff)
+            .limit(OTP_PURGE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if ids:
+            # Outbox rows reference the OTP, so they go first
+            await session.exec(delete(OTPDelivery).where(OTPDelivery.otp_id.in_(ids)))
+            await session.exec(delete(OTP).where(OTP.id.in_(ids)))
+        await session.commit()
+        return len(ids)
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "purged_total": self.purged_total,
+            "last_purged": self.last_purged,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "table_rows": self.table_rows,
+            "table_bytes": self.table_bytes,
+        }
+
+
+async def table_size(session: AsyncSession) -> tuple[int | None, int | None]:
+    """(rows, bytes) of the otp table. Postgres uses planner stats, so no full count."""
+    if async_engine.dialect.name == "postgresql":
+        row = (await session.exec(text(
+            "SELECT reltuples::bigint, pg_total_relation_size(oid) FROM pg_class WHERE relname = 'otp'"
+        ))).first()
+        return (max(row[0], 0), row[1]) if row else (None, None)
+    rows = (await session.exec(select(func.count()).select_from(OTP))).one()
+    return rows, None
+
+
+otp_purge = OTPPurgeJob()
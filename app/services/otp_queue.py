@@ -0,0 +1,178 @@
+import os
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import async_engine
+from app.models import OTP, OTPDelivery, DeliveryStatus
+from app.services.sms import SMSProvider, SMSMessage, create_sms_provider
+
+logger = logging.getLogger(__name__)
+
+OTP_WORKERS = int(os.getenv("OTP_WORKERS", "4"))
+# Wait this long for more messages to fill a batch
+OTP_BATCH_WINDOW_SECONDS = float(os.getenv("OTP_BATCH_WINDOW_MS", "20")) / 1000
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+OTP_RETRY_BASE_SECONDS = float(os.getenv("OTP_RETRY_BASE_SECONDS", "2"))
+OTP_RETRY_MAX_SECONDS = float(os.getenv("OTP_RETRY_MAX_SECONDS", "120"))
+# How often the outbox is scanned for retries / rows left over from a restart
+OTP_OUTBOX_POLL_SECONDS = float(os.getenv("OTP_OUTBOX_POLL_SECONDS", "5"))
+# A claimed delivery is due again after this if its worker died mid-send
+OTP_CLAIM_LEASE_SECONDS = int(os.getenv("OTP_CLAIM_LEASE_SECONDS", "30"))
+
+
+def otp_message(code: str) -> str:
+    return f"{code} is your Tenexis verification code. It expires in 10 minutes."
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: ~2s, 4s, 8s... capped."""
+    delay = min(OTP_RETRY_MAX_SECONDS, OTP_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class OTPDeliveryQueue:
+    """
+    Sends OTPDelivery rows off the request path. Requests commit the row and
+    enqueue its id; workers batch ids, claim them in the DB (so several
+    uvicorn workers never send the same code twice) and send through the
+    SMS provider. Failures are rescheduled in the row, and a sweeper
+    re-enqueues anything due, including rows left over from a restart.
+    """
+
+    def __init__(self, provider: SMSProvider | None = None):
+        self.provider = provider
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._queue: asyncio.Queue | None = None
+        self._queued: set[int] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self, workers: int = OTP_WORKERS):
+        self.provider = self.provider or create_sms_provider()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.provider:
+            await self.provider.close()
+
+    def enqueue(self, delivery_id: int):
+        """Call after the commit. Without a running queue the sweeper picks it up later."""
+        if self._queue is not None and delivery_id not in self._queued:
+            self._queued.add(delivery_id)
+            self._queue.put_nowait(delivery_id)
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Fill the batch with whatever arrives within the window
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + OTP_BATCH_WINDOW_SECONDS
+            while len(batch) < self.provider.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), max(0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+            self._queued.difference_update(batch)
+            try:
+                await self.deliver(batch)
+            except Exception:
+                # Rows stay pending and come back through the sweeper
+                logger.exception("OTP delivery batch failed")
+
+    async def _sweeper(self):
+        while True:
+            try:
+                async with AsyncSession(async_engine) as session:
+                    due = (await session.exec(
+                        select(OTPDelivery.id)
+                        .where(OTPDelivery.status == DeliveryStatus.pending, OTPDelivery.next_attempt_at <= datetime.utcnow())
+                        .order_by(OTPDelivery.next_attempt_at)
+                        .limit(500)
+                    )).all()
+                for delivery_id in due:
+                    self.enqueue(delivery_id)
+            except Exception:
+                logger.exception("OTP outbox sweep failed")
+            await asyncio.sleep(OTP_OUTBOX_POLL_SECONDS)
+
+    async def deliver(self, delivery_ids: list[int]):
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            now = datetime.utcnow()
+            # Claim: only rows still pending and due, and push them out by the lease
+            claimed = (await session.exec(
+                update(OTPDelivery)
+                .where(
+                    OTPDelivery.id.in_(delivery_ids),
+                    OTPDelivery.status == DeliveryStatus.pending,
+                    OTPDelivery.next_attempt_at <= now,
+                )
+                .values(next_attempt_at=now + timedelta(seconds=OTP_CLAIM_LEASE_SECONDS))
+                .returning(OTPDelivery.id)
+            )).scalars().all()
+            await session.commit()
+            if not claimed:
+                return
+
+            rows = (await session.exec(
+                select(OTPDelivery, OTP).join(OTP, OTP.id == OTPDelivery.otp_id).where(OTPDelivery.id.in_(claimed))
+            )).all()
+            # Don't hold a transaction / connection while waiting on the gateway
+            await session.commit()
+
+            # Expired codes are pointless to send
+            live = []
+            for delivery, otp in rows:
+                if otp.expires_at <= now:
+                    self._finish(delivery, "expired before delivery", final=True)
+                else:
+                    live.append((delivery, otp))
+
+            if live:
+                try:
+                    results = await self.provider.send_batch([SMSMessage(otp.phone_number, otp_message(otp.code)) for _, otp in live])
+                except Exception as e:
+                    results = [f"{type(e).__name__}: {e}"] * len(live)
+                for (delivery, _), error in zip(live, results):
+                    self._finish(delivery, error)
+
+            session.add_all([delivery for delivery, _ in rows])
+            await session.commit()
+
+    def _finish(self, delivery: OTPDelivery, error: str | None, final: bool = False):
+        now = datetime.utcnow()
+        if error is None:
+            delivery.status = DeliveryStatus.sent
+            delivery.sent_at = now
+            delivery.last_error = None
+            self.sent += 1
+            return
+        delivery.attempts += 1
+        delivery.last_error = error[:500]
+        if final or delivery.attempts >= OTP_MAX_ATTEMPTS:
+            delivery.status = DeliveryStatus.failed
+            self.failed += 1
+        else:
+            delivery.next_attempt_at = now + timedelta(seconds=retry_delay(delivery.attempts))
+            self.retried += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+otp_queue = OTPDeliveryQueue()
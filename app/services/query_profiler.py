@@ -0,0 +1,151 @@
+import os
+import re
+import time
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from starlette.datastructures import MutableHeaders
+from app.services.metrics import RequestStats, request_stats, UNMATCHED
+
+logger = logging.getLogger(__name__)
+
+# Debug only: adds Server-Timing / X-DB-Queries headers and logs suspected N+1s
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# A statement shape run this many times in one request is reported as a likely N+1
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "3"))
+
+PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+PLACEHOLDER_LIST = re.compile(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})*\s*\)")
+NUMBER = re.compile(r"\b\d+\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    SQL with IN-lists and numbers folded, so selectinload's `IN (?, ?, ?)` and a
+    loop's `WHERE id = ?` compare equal across row counts.
+    """
+    shape = PLACEHOLDER_LIST.sub("(?)", statement)
+    shape = NUMBER.sub("N", shape)
+    return WHITESPACE.sub(" ", shape).strip()
+
+
+def repeated_statements(statements: Counter, threshold: int = SQL_REPEAT_THRESHOLD) -> list[tuple[str, int]]:
+    """(shape, executions) for every shape run at least `threshold` times, most first."""
+    shapes = Counter()
+    for statement, count in statements.items():
+        shapes[statement_shape(statement)] += count
+    return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+@dataclass
+class QueryProfile:
+    method: str
+    path: str
+    route: str
+    queries: int
+    db_ms: float
+    repeated: list[tuple[str, int]] = field(default_factory=list)
+
+    def describe(self) -> str:
+        where = f"{self.method} {self.path} ({self.route})" if self.method else self.route
+        return f"{where}: {self.queries} queries, {self.db_ms:.1f} ms"
+
+
+# Active QueryRecorders; requests served while one is active are profiled into it
+_recorders: list["QueryRecorder"] = []
+
+
+class QueryRecorder:
+    """
+    Collects a QueryProfile for every request served while active (any thread,
+    so it works with TestClient), plus the queries run directly in the block:
+
+        with QueryRecorder() as recorder:
+            client.get("/api/products/")
+        assert not recorder.violations(max_queries=5)
+    """
+
+    def __init__(self):
+        self.profiles: list[QueryProfile] = []
+        self.stats = RequestStats(record_statements=True)
+
+    def __enter__(self):
+        _recorders.append(self)
+        self._token = request_stats.set(self.stats)
+        return self
+
+    def __exit__(self, *exc):
+        request_stats.reset(self._token)
+        _recorders.remove(self)
+        if self.stats.db_queries:
+            self.profiles.append(QueryProfile(
+                "", "", "<outside requests>", self.stats.db_queries, self.stats.db_seconds * 1000,
+                repeated_statements(self.stats.statements),
+            ))
+
+    def violations(self, max_queries: int | None = None, allow_repeats: bool = False) -> list[str]:
+        """Human readable budget / N+1 failures, empty if everything is within budget."""
+        problems = []
+        for profile in self.profiles:
+            if max_queries is not None and profile.queries > max_queries:
+                problems.append(f"{profile.describe()} - over the budget of {max_queries}")
+            if not allow_repeats:
+                for shape, count in profile.repeated:
+                    problems.append(f"{profile.describe()} - repeated {count}x (N+1?): {shape}")
+        return problems
+
+
+class QueryProfilerMiddleware:
+    """
+    Records every statement of a request when SQL_PROFILE is on or a
+    QueryRecorder is active; otherwise a pass-through. With SQL_PROFILE the
+    response gets Server-Timing (db, app) and X-DB-Queries headers, and
+    repeated statement shapes are logged as likely N+1s.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SQL_PROFILE or _recorders):
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(record_statements=True)
+        outer = request_stats.get()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if SQL_PROFILE and message["type"] == "http.response.start":
+                app_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", (
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries", '
+                    f"app;dur={app_ms:.1f}"
+                ))
+                headers.append("X-DB-Queries", str(stats.db_queries))
+                repeated = repeated_statements(stats.statements)
+                if repeated:
+                    headers.append("X-DB-Repeated", str(len(repeated)))
+            await send(message)
+
+        token = request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            # Still counted by the metrics middleware outside this one
+            # (but not twice by a recorder's own block-level stats)
+            if outer is not None and not any(outer is r.stats for r in _recorders):
+                outer.db_seconds += stats.db_seconds
+                outer.db_queries += stats.db_queries
+
+            profile = QueryProfile(
+                scope["method"], scope["path"], getattr(scope.get("route"), "path", UNMATCHED),
+                stats.db_queries, stats.db_seconds * 1000, repeated_statements(stats.statements),
+            )
+            for recorder in list(_recorders):
+                recorder.profiles.append(profile)
+            if SQL_PROFILE:
+                for shape, count in profile.repeated:
+                    logger.warning("Possible N+1 in %s: %dx %s", profile.describe(), count, shape)
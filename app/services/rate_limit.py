@@ -0,0 +1,156 @@
+import os
+import re
+import math
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from app.database import request_user_id
+
+# "memory" (default, per worker), "redis" (shared by all workers) or "off"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Memory backend: most buckets kept; the least recently used are dropped first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Behind a proxy / load balancer the client address is in X-Forwarded-For
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+# Proxies of ours in front of the app; each appends the address it got the
+# request from, so the client is this many entries from the right
+TRUSTED_PROXY_COUNT = max(1, int(os.getenv("TRUSTED_PROXY_COUNT", "1")))
+
+PERIODS = {"s": 1, "second": 1, "m": 60, "minute": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$")
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """Parses "5/minute", "3/10m" or "100/h" into (requests, period in seconds)."""
+    match = RATE.match(rate.lower())
+    if not match or match[3] not in PERIODS:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    return int(match[1]), int(match[2] or 1) * PERIODS[match[3]]
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            # Entries left of the ones our proxies added come from the client
+            # and can be anything, so never take the leftmost
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            if hops:
+                return hops[-min(TRUSTED_PROXY_COUNT, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimitBackend:
+    """Token buckets by key. hit() takes a token: (allowed, seconds until one is free)."""
+
+    async def hit(self, key: str, capacity: int, refill_per_second: float) -> tuple[bool, float]:
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """One (tokens, last refill) pair per key: O(1) per check, bounded LRU."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, capacity: int, refill_per_second: float) -> tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / refill_per_second
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Same bucket in a Redis hash, updated atomically by a Lua script so all
+    workers share one limit. Uses the Redis clock, not the workers'.
+    """
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local allowed = 0
+    local retry = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry)}
+    """
+
+    def __init__(self, url: str):
+        # Optional dependency, only needed with RATE_LIMIT_BACKEND=redis
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, capacity: int, refill_per_second: float) -> tuple[bool, float]:
+        allowed, retry = await self.script(keys=[f"rl:{key}"], args=[capacity, refill_per_second])
+        return bool(allowed), float(retry)
+
+
+def create_backend() -> RateLimitBackend | None:
+    if RATE_LIMIT_BACKEND == "off":
+        return None
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(REDIS_URL)
+    return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+
+
+backend = create_backend()
+
+
+class RateLimit:
+    """
+    A named token bucket limit, e.g. RateLimit("otp_phone", "3/10m").
+    RATE_LIMIT_<NAME> (e.g. RATE_LIMIT_OTP_PHONE=5/10m) overrides the rate.
+    `burst` is the bucket size, defaulting to the request count.
+
+    Use `Depends(limit.by_ip)` / `Depends(limit.by_user)` on a route, or
+    `await limit.check(key)` for keys only known inside it (a phone number).
+    """
+
+    def __init__(self, name: str, rate: str, burst: int | None = None):
+        self.name = name
+        requests, period = parse_rate(os.getenv(f"RATE_LIMIT_{name.upper()}", rate))
+        self.capacity = burst or requests
+        self.refill_per_second = requests / period
+
+    async def check(self, key: str):
+        if backend is None:
+            return
+        allowed, retry_after = await backend.hit(f"{self.name}:{key}", self.capacity, self.refill_per_second)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    async def by_ip(self, request: Request):
+        await self.check(client_ip(request))
+
+    async def by_user(self, request: Request):
+        """Keyed by the bearer token's user_id; anonymous callers fall back to their IP."""
+        user_id = request_user_id(request)
+        await self.check(f"user:{user_id}" if user_id is not None else client_ip(request))
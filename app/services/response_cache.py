@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from fastapi import Response
+from app.services.auth_cache import UserSnapshot
+
+# "memory" (default, per worker), "redis" (shared by all workers) or "off"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Upper bound on staleness for changes made on another worker (memory backend)
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+@dataclass
+class CachedResponse:
+    """A serialized JSON body plus the headers that go with it (e.g. X-Next-Cursor)."""
+    body: bytes
+    headers: dict = field(default_factory=dict)
+
+    def encode(self) -> bytes:
+        # Header line, newline, body: one bytes value any backend can store
+        return json.dumps(self.headers).encode() + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CachedResponse":
+        headers, body = data.split(b"\n", 1)
+        return cls(body=body, headers=json.loads(headers))
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+def viewer_segment(user: UserSnapshot | None) -> str:
+    """
+    Cache segment for a viewer: everyone in a segment sees the same products.
+    Owners also see their own listings whatever the visibility, so viewers
+    with listings get a segment of their own.
+    """
+    if user is None:
+        return "guest"
+    if user.has_listings:
+        return f"user:{user.id}"
+    city = (user.college_city or "").lower()
+    return f"seg:{user.college_slug or ''}|{user.gender or ''}|{city}"
+
+
+class CacheBackend:
+    """Bytes by key. Keys carry a version; invalidate() bumps it."""
+
+    async def version(self) -> int:
+        raise NotImplementedError
+
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    async def invalidate(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """LRU bounded by total bytes, entries expire after `ttl` seconds."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._version = 0
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def version(self) -> int:
+        return self._version
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    async def invalidate(self):
+        self._version += 1
+        self._data.clear()
+        self.size = 0
+
+    def _remove(self, key: str):
+        _, value = self._data.pop(key)
+        self.size -= len(value)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self.size}
+
+
+class RedisBackend(CacheBackend):
+    """
+    Shared by all workers, so one worker's invalidate() is seen by the rest.
+    Redis does the eviction (set maxmemory-policy allkeys-lru on the server).
+    """
+
+    VERSION_KEY = "rc:version"
+
+    def __init__(self, url: str, ttl: int):
+        # Optional dependency, only needed with RESPONSE_CACHE_BACKEND=redis
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+
+    async def version(self) -> int:
+        return int(await self.client.get(self.VERSION_KEY) or 0)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(f"rc:{key}")
+
+    async def set(self, key: str, value: bytes):
+        await self.client.set(f"rc:{key}", value, ex=self.ttl)
+
+    async def invalidate(self):
+        # Old keys are never read again and expire on their own
+        await self.client.incr(self.VERSION_KEY)
+
+
+class BuildAbandoned(Exception):
+    """Tells singleflight waiters the build they joined was cancelled."""
+
+
+class ResponseCache:
+    """
+    Caches serialized responses, with singleflight: concurrent misses on
+    the same key wait for one build instead of each querying the DB.
+    """
+
+    def __init__(self, backend: CacheBackend | None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get_or_build(self, key: str, build: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        if self.backend is None:
+            return await build()
+
+        # Versioned key: a build that races an invalidate() lands under the old version
+        key = f"{await self.backend.version()}:{key}"
+        data = await self.backend.get(key)
+        if data is not None:
+            self.hits += 1
+            return CachedResponse.decode(data)
+
+        while (inflight := self._inflight.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except BuildAbandoned:
+                # The leader's request was cancelled: one of us builds instead
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await build()
+            await self.backend.set(key, entry.encode())
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            # Waiters get the same error (e.g. the 404); don't cache it
+            future.set_exception(e)
+            future.exception()  # mark retrieved, there may be no waiters
+            raise
+        except BaseException:
+            # Cancellation (client went away) is this request's, not the waiters'
+            future.set_exception(BuildAbandoned())
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self):
+        """Call after anything that changes what product endpoints return."""
+        if self.backend is not None:
+            await self.backend.invalidate()
+
+    def stats(self) -> dict:
+        stats = {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+
+def create_response_cache() -> ResponseCache:
+    if RESPONSE_CACHE_BACKEND == "off":
+        return ResponseCache(None)
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return ResponseCache(RedisBackend(REDIS_URL, RESPONSE_CACHE_TTL))
+    return ResponseCache(MemoryBackend(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL))
+
+
+# Product list / detail responses
+response_cache = create_response_cache()
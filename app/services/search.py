@@ -0,0 +1,109 @@
+import re
+from sqlalchemy import text, func, literal_column, table, column, or_
+from sqlalchemy.engine import Engine
+from sqlmodel import select
+from app.models import Product
+
+# Text search config used for the Postgres tsvector (stemming + stop words)
+TS_CONFIG = "english"
+MAX_TERMS = 8
+
+PG_SEARCH_DDL = [
+    f"""
+    ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product USING GIN (search_vector)",
+]
+
+# External-content FTS5 table kept in sync with `product` by triggers
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        title, description, content='product', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF title, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO product_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def install_search_index(engine: Engine):
+    """Creates the full-text index for the current dialect (idempotent)."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            for ddl in PG_SEARCH_DDL:
+                conn.execute(text(ddl))
+        elif dialect == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'product_fts'")
+            ).first()
+            for ddl in SQLITE_SEARCH_DDL:
+                conn.execute(text(ddl))
+            # First install on an existing DB: index the rows already there
+            if not exists:
+                conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+
+
+def search_terms(q: str) -> list[str]:
+    # Only keep word characters, so user input never reaches the query syntax
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def build_search_query(dialect: str, terms: list[str]):
+    """
+    Ranked select(Product) matching all `terms`, the last one as a prefix.
+    Other dialects fall back to an ILIKE scan.
+    """
+    *full, last = terms
+
+    if dialect == "postgresql":
+        tsquery = " & ".join(full + [f"{last}:*"])
+        ts = func.to_tsquery(TS_CONFIG, tsquery)
+        vector = literal_column("product.search_vector")
+        rank = func.ts_rank_cd(vector, ts)
+        return (
+            select(Product)
+            .where(vector.op("@@")(ts))
+            .order_by(rank.desc(), Product.id.desc())
+        )
+
+    if dialect == "sqlite":
+        match = " ".join([f'"{t}"' for t in full] + [f'"{last}" *'])
+        fts = table("product_fts", column("rowid"))
+        return (
+            select(Product)
+            .join(fts, fts.c.rowid == Product.id)
+            .where(literal_column("product_fts").op("MATCH")(match))
+            .order_by(func.bm25(literal_column("product_fts")), Product.id.desc())
+        )
+
+    query = select(Product)
+    for term in terms:
+        query = query.where(
+            or_(Product.title.ilike(f"%{term}%"), Product.description.ilike(f"%{term}%"))
+        )
+    return query.order_by(Product.created_at.desc(), Product.id.desc())
@@ -0,0 +1,74 @@
+import os
+import types
+import typing
+from typing import Any, Callable
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    # Optional: serializes dicts / datetimes / enums straight to bytes
+    import orjson
+except ImportError:
+    orjson = None
+
+# Default mode for FastJSON: "projection" (attribute projection + orjson)
+# or "adapter" (pydantic validate + dump_json). Projection needs orjson.
+SERIALIZER = os.getenv("SERIALIZER", "projection")
+
+
+def _unwrap(annotation) -> tuple[Any, bool]:
+    """(inner type, is_list) for X, Optional[X], List[X] and Optional[List[X]]."""
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType) and len(args) == 1:
+        annotation = args[0]
+    if typing.get_origin(annotation) in (list, typing.List):
+        return typing.get_args(annotation)[0], True
+    return annotation, False
+
+
+def compile_projection(model: type[BaseModel]) -> Callable[[Any], dict]:
+    """
+    Builds obj -> dict for a read schema, reading only the schema's fields
+    (and computed fields) off an ORM object, without pydantic validation.
+    Nested read models are projected recursively. Compiled once per schema,
+    so it always matches the schema's field list.
+    """
+    plan = []
+    for name, info in model.model_fields.items():
+        inner, is_list = _unwrap(info.annotation)
+        nested = compile_projection(inner) if isinstance(inner, type) and issubclass(inner, BaseModel) else None
+        plan.append((name, nested, is_list))
+    computed = [(name, info.wrapped_property.fget) for name, info in model.model_computed_fields.items()]
+
+    def project(obj) -> dict:
+        out = {}
+        for name, nested, is_list in plan:
+            value = getattr(obj, name)
+            if nested is not None and value is not None:
+                value = [nested(v) for v in value] if is_list else nested(value)
+            out[name] = value
+        for name, fget in computed:
+            # Computed properties only read attributes, so they work on the ORM object too
+            out[name] = fget(obj)
+        return out
+
+    return project
+
+
+class FastJSON:
+    """
+    JSON bytes for a response schema (a read model or List[read model]).
+    Each route picks its serializer; `mode` overrides SERIALIZER for it.
+    """
+
+    def __init__(self, schema, mode: str | None = None):
+        self.adapter = TypeAdapter(schema)
+        inner, self.is_list = _unwrap(schema)
+        self.project = compile_projection(inner)
+        mode = mode or SERIALIZER
+        self.mode = mode if mode == "adapter" or orjson is not None else "adapter"
+
+    def dumps(self, obj) -> bytes:
+        if self.mode == "adapter":
+            return self.adapter.dump_json(self.adapter.validate_python(obj, from_attributes=True))
+        data = [self.project(o) for o in obj] if self.is_list else self.project(obj)
+        return orjson.dumps(data)
@@ -0,0 +1,101 @@
+import os
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# "fake" (default, logs instead of sending) or "http"
+SMS_PROVIDER = os.getenv("SMS_PROVIDER", "fake")
+# Messages per provider call; 1 if the gateway has no bulk endpoint
+SMS_BATCH_SIZE = int(os.getenv("SMS_BATCH_SIZE", "50"))
+SMS_TIMEOUT_SECONDS = float(os.getenv("SMS_TIMEOUT_SECONDS", "10"))
+
+
+@dataclass
+class SMSMessage:
+    to: str
+    body: str
+
+
+class SMSProvider:
+    """send_batch() returns one entry per message: None if sent, else the error."""
+
+    batch_size = 1
+
+    async def send_batch(self, messages: list[SMSMessage]) -> list[str | None]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class FakeSMSProvider(SMSProvider):
+    """
+    Local / test provider: logs the message and keeps it in `sent`.
+    `failure_rate` and `latency` simulate a flaky, slow gateway.
+    """
+
+    def __init__(self, batch_size: int = SMS_BATCH_SIZE, failure_rate: float = 0.0, latency: float = 0.0):
+        self.batch_size = batch_size
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.sent: list[SMSMessage] = []
+        self.calls = 0
+
+    async def send_batch(self, messages: list[SMSMessage]) -> list[str | None]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        results = []
+        for message in messages:
+            if random.random() < self.failure_rate:
+                results.append("simulated gateway failure")
+                continue
+            logger.info("[SMS MOCK] To: %s | %s", message.to, message.body)
+            self.sent.append(message)
+            results.append(None)
+        return results
+
+
+class HTTPSMSProvider(SMSProvider):
+    """
+    Generic JSON gateway: POST SMS_API_URL {"sender", "messages": [{"to", "body"}]}
+    with a bearer SMS_API_KEY. One pooled client for the whole process.
+    """
+
+    def __init__(self):
+        import httpx
+
+        self.url = os.environ["SMS_API_URL"]
+        self.sender = os.getenv("SMS_SENDER", "TENEXS")
+        self.batch_size = SMS_BATCH_SIZE
+        self.client = httpx.AsyncClient(
+            timeout=SMS_TIMEOUT_SECONDS,
+            headers={"Authorization": f"Bearer {os.getenv('SMS_API_KEY', '')}"},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def send_batch(self, messages: list[SMSMessage]) -> list[str | None]:
+        import httpx
+
+        try:
+            response = await self.client.post(self.url, json={
+                "sender": self.sender,
+                "messages": [{"to": m.to, "body": m.body} for m in messages],
+            })
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            # Whole batch failed; it is retried as a whole
+            return [f"{type(e).__name__}: {e}"] * len(messages)
+        return [None] * len(messages)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_sms_provider() -> SMSProvider:
+    if SMS_PROVIDER == "http":
+        return HTTPSMSProvider()
+    return FakeSMSProvider()
@@ -0,0 +1,211 @@
+import os
+import io
+from datetime import datetime
+from typing import Iterator
+
+# "local" (default) or "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+
+
+class StorageBackend:
+    """
+    Where image blobs live. Names are relative paths like "ab/cd/<key>.webp".
+    Methods are blocking; async callers wrap them in asyncio.to_thread.
+    """
+
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, name: str, data: bytes, content_type: str = "image/webp"):
+        raise NotImplementedError
+
+    def get(self, name: str) -> bytes | None:
+        raise NotImplementedError
+
+    def touch(self, name: str, content_type: str = "image/webp") -> bool:
+        """Sets the blob's last modified time to now. False if it doesn't exist."""
+        raise NotImplementedError
+
+    def delete(self, name: str):
+        raise NotImplementedError
+
+    def list(self) -> Iterator[tuple[str, datetime]]:
+        """Yields (name, last_modified) for every stored blob."""
+        raise NotImplementedError
+
+    def url(self, name: str) -> str:
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Files under `root`, served by the /static mount in main.py."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def put(self, name: str, data: bytes, content_type: str = "image/webp"):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write + rename so readers never see a half-written blob
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, name: str) -> bytes | None:
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def touch(self, name: str, content_type: str = "image/webp") -> bool:
+        try:
+            os.utime(self._path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def list(self) -> Iterator[tuple[str, datetime]]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                yield name, datetime.fromtimestamp(os.path.getmtime(path))
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/{name}"
+
+
+class S3Storage(StorageBackend):
+    """
+    Any S3-compatible store (AWS, R2, MinIO, moto for tests).
+    One pooled client per process; large objects go up as multipart.
+    """
+
+    def __init__(self):
+        # Optional dependency, only needed with STORAGE_BACKEND=s3
+        import boto3
+        from botocore.config import Config
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = os.environ["S3_BUCKET"]
+        self.prefix = os.getenv("S3_PREFIX", "uploads/products")
+        endpoint_url = os.getenv("S3_ENDPOINT_URL")
+        region = os.getenv("S3_REGION", "ap-south-1")
+
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(
+                max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", "20")),
+                retries={"max_attempts": 3, "mode": "standard"},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))),
+            multipart_chunksize=int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))),
+            max_concurrency=int(os.getenv("S3_MULTIPART_CONCURRENCY", "4")),
+        )
+
+        # Public URL for blobs: CDN in front of the bucket, else the bucket itself
+        public_url = os.getenv("S3_PUBLIC_URL")
+        if not public_url:
+            if endpoint_url:
+                public_url = f"{endpoint_url.rstrip('/')}/{self.bucket}"
+            else:
+                public_url = f"https://{self.bucket}.s3.{region}.amazonaws.com"
+        self.public_url = public_url.rstrip("/")
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def exists(self, name: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+            return True
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, name: str, data: bytes, content_type: str = "image/webp"):
+        # upload_fileobj switches to concurrent multipart above the threshold
+        self.client.upload_fileobj(
+            io.BytesIO(data),
+            self.bucket,
+            self._key(name),
+            ExtraArgs={
+                "ContentType": content_type,
+                "CacheControl": "public, max-age=31536000, immutable",
+            },
+            Config=self.transfer_config,
+        )
+
+    def get(self, name: str) -> bytes | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def touch(self, name: str, content_type: str = "image/webp") -> bool:
+        from botocore.exceptions import ClientError
+
+        key = self._key(name)
+        try:
+            # S3 has no touch: copying the object onto itself with replaced
+            # metadata is what updates LastModified
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={"Bucket": self.bucket, "Key": key},
+                MetadataDirective="REPLACE",
+                ContentType=content_type,
+                CacheControl="public, max-age=31536000, immutable",
+            )
+            return True
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def list(self) -> Iterator[tuple[str, datetime]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(prefix):], obj["LastModified"]
+
+    def url(self, name: str) -> str:
+        return f"{self.public_url}/{self._key(name)}"
+
+
+def create_storage(local_root: str, local_url: str) -> StorageBackend:
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    return LocalStorage(local_root, local_url)
@@ -0,0 +1,57 @@
+from typing import Optional
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import aliased
+from app.models import Product, User, College, ProductVisibility
+from app.services.auth_cache import UserSnapshot
+
+# Aliases for the product owner and the owner's college, so the predicate can
+# be added to queries that already join User/College for other reasons.
+Owner = aliased(User, name="owner")
+OwnerCollege = aliased(College, name="owner_college")
+
+
+def apply_visibility(query, user: Optional[UserSnapshot]):
+    """
+    SQL version of check_visibility() in app/routers/products.py.
+    Adds a WHERE clause for what `user` (None = guest) may see, and only
+    joins the owner / owner's college when the viewer can match on them.
+    """
+    # Guests only ever see public products, no joins needed
+    if not user:
+        return query.where(Product.visibility == ProductVisibility.public)
+
+    user_city = user.college_city
+
+    conditions = [
+        Product.user_id == user.id,
+        Product.visibility == ProductVisibility.public,
+    ]
+
+    needs_owner = bool(user.college_slug or user.gender or user_city)
+
+    if user.college_slug:
+        conditions.append(and_(
+            Product.visibility == ProductVisibility.college,
+            Owner.college_slug == user.college_slug,
+        ))
+
+    if user.gender:
+        conditions.append(and_(
+            Product.visibility == ProductVisibility.gender,
+            Owner.gender == user.gender,
+        ))
+
+    if user_city:
+        # Product city wins, else fall back to the owner's college city
+        target_city = func.coalesce(func.nullif(Product.city, ""), OwnerCollege.city)
+        conditions.append(and_(
+            Product.visibility == ProductVisibility.city,
+            func.lower(target_city) == user_city.lower(),
+        ))
+
+    if needs_owner:
+        query = query.join(Owner, Owner.id == Product.user_id)
+    if user_city:
+        query = query.outerjoin(OwnerCollege, OwnerCollege.slug == Owner.college_slug)
+
+    return query.where(or_(*conditions))
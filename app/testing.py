@@ -0,0 +1,26 @@
+"""
+Pytest helpers. Load with `pytest_plugins = ["app.testing"]` in conftest.py.
+
+    def test_feed_queries(client, query_budget):
+        with query_budget(max_queries=5):
+            client.get("/api/products/")
+
+fails the test if a request inside the block runs more than 5 statements
+or repeats a statement shape SQL_REPEAT_THRESHOLD+ times (a likely N+1).
+"""
+from contextlib import contextmanager
+import pytest
+from app.services.query_profiler import QueryRecorder
+
+
+@pytest.fixture
+def query_budget():
+    @contextmanager
+    def budget(max_queries: int | None = None, allow_repeats: bool = False):
+        with QueryRecorder() as recorder:
+            yield recorder
+        problems = recorder.violations(max_queries, allow_repeats)
+        if problems:
+            pytest.fail("Query budget exceeded:\n" + "\n".join(problems), pytrace=False)
+
+    return budget
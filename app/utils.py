@@ -1,11 +1,13 @@
 import re
-import random
-import string
 import os
+import base64
+from datetime import datetime
 from google.oauth2 import id_token
 from google.auth.transport import requests
-from sqlmodel import Session, select
-from app.models import User
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
@@ -22,13 +24,60 @@ def generate_slug(text: str) -> str:
     slug = re.sub(r'[\s_-]+', '-', slug)
     return slug
 
-def generate_unique_username(email: str, session: Session) -> str:
-    base_username = generate_slug(email.split("@")[0])
-    username = base_username
-    
-    # If username exists, append random digits
-    while session.exec(select(User).where(User.username == username)).first():
-        suffix = ''.join(random.choices(string.digits, k=3))
-        username = f"{base_username}-{suffix}"
-    
-    return username
\ No newline at end of file
+# --- Unique Slugs ---
+# Allocation leans on the unique constraint: pick the next free "base-N" from
+# one query, insert under a savepoint, and only on a conflict (a concurrent
+# insert took it) pick again.
+SLUG_INSERT_ATTEMPTS = 5
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+async def highest_suffix(session: AsyncSession, column, base: str) -> tuple[bool, int]:
+    """(is base itself taken, highest N among base-N values in use, 0 if none) from one query."""
+    taken = (await session.exec(
+        select(column).where(or_(column == base, column.like(f"{escape_like(base)}-%", escape="\\")))
+    )).all()
+    suffixes = [int(value[len(base) + 1:]) for value in taken if value[len(base) + 1:].isdigit()]
+    return base in taken, max(suffixes, default=0)
+
+async def next_free_value(session: AsyncSession, column, base: str) -> str:
+    """`base` if free, else base-N with N one past the highest suffix in use."""
+    base_taken, suffix = await highest_suffix(session, column, base)
+    if not base_taken:
+        return base
+    return f"{base}-{max(suffix, 1) + 1}"
+
+async def insert_with_unique_slug(session: AsyncSession, obj, field: str, base: str):
+    """
+    Adds `obj` with a unique value for `field` and flushes it, without
+    committing. Retries only when that value was taken concurrently.
+    """
+    column = getattr(type(obj), field)
+    for attempt in range(SLUG_INSERT_ATTEMPTS):
+        value = await next_free_value(session, column, base)
+        setattr(obj, field, value)
+        try:
+            async with session.begin_nested():
+                session.add(obj)
+            return obj
+        except IntegrityError:
+            # Some other constraint (or out of attempts): not ours to retry
+            taken = (await session.exec(select(column).where(column == value))).first()
+            if taken is None or attempt == SLUG_INSERT_ATTEMPTS - 1:
+                raise
+
+# --- Keyset Cursors ---
+# A cursor is the (created_at, id) of the last row on the previous page,
+# base64 encoded so clients treat it as an opaque token.
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
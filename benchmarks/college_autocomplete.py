@@ -0,0 +1,100 @@
+"""
+/api/colleges/search: the in-process CollegeIndex vs the `%q%` ILIKE
+query it replaced, on a synthetic College table (50k rows by default) in a
+throwaway SQLite database. Also times the index build.
+
+    python benchmarks/college_autocomplete.py [--colleges 50000]
+"""
+import os
+import sys
+import time
+import random
+import string
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import College
+from app.services.college_index import CollegeIndex
+
+WORDS = [
+    "Institute", "Technology", "College", "Engineering", "National", "University", "Science",
+    "Arts", "Commerce", "Management", "Medical", "Law", "Indian", "Government", "Saint", "Public",
+]
+CITIES = ["Mumbai", "Pune", "Delhi", "Chennai", "Kolkata", "Bangalore", "Hyderabad", "Jaipur", "Surat", "Indore"]
+
+# Keystroke-sized prefixes (very common ones included), multi-word, typos, no hit
+QUERIES = ["in", "s", "tech", "indian inst", "tech mum", "iit bom", "technolgy bomby", "engneering", "zzqx"]
+RUNS = 200
+# The ILIKE scan is ~100x slower; fewer runs keep the script quick
+ILIKE_RUNS = 20
+
+
+def populate(engine, rows: int):
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(1)
+    batch = [{"name": "Indian Institute of Technology Bombay", "slug": "iitb", "domain": "iitb.ac.in", "city": "Mumbai"}]
+    for i in range(rows - 1):
+        name = " ".join(rng.sample(WORDS, 3)) + " " + "".join(rng.choices(string.ascii_lowercase, k=6)).title()
+        batch.append({"name": name, "slug": f"c{i}", "domain": f"c{i}.ac.in", "city": rng.choice(CITIES)})
+    with engine.begin() as conn:
+        conn.execute(insert(College), batch)
+
+
+def timings(fn, runs: int = RUNS) -> tuple[float, float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), statistics.quantiles(samples, n=100)[98]
+
+
+def ilike(session: Session, q: str):
+    # The query search_colleges used to run on every keystroke
+    statement = select(College).where(College.name.ilike(f"%{q}%") | College.city.ilike(f"%{q}%")).limit(10)
+    return session.exec(statement).all()
+
+
+async def load_index(url: str) -> tuple[CollegeIndex, float]:
+    engine = create_async_engine(url)
+    index = CollegeIndex()
+    async with AsyncSession(engine) as session:
+        started = time.perf_counter()
+        await index.load(session)
+        seconds = time.perf_counter() - started
+    await engine.dispose()
+    return index, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--colleges", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/colleges.db")
+        populate(engine, args.colleges)
+        index, build_seconds = asyncio.run(load_index(f"sqlite+aiosqlite:///{tmp}/colleges.db"))
+
+        print(f"{args.colleges} colleges, index load + build {build_seconds * 1000:.0f} ms")
+        print(f"{'query':>16} {'index p50':>10} {'p99':>7} {'ilike p50':>10} {'p99':>7}   top hit")
+        with Session(engine) as session:
+            for q in QUERIES:
+                index_p50, index_p99 = timings(lambda: index.search(q))
+                ilike_p50, ilike_p99 = timings(lambda: ilike(session, q), ILIKE_RUNS)
+                hits = index.search(q)
+                top = hits[0].name if hits else "-"
+                print(f"{q:>16} {index_p50:>10.3f} {index_p99:>7.3f} {ilike_p50:>10.3f} {ilike_p99:>7.3f}   {top}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
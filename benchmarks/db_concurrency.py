@@ -0,0 +1,137 @@
+"""
+Blocking Session inside `async def` (how the routers used to run) vs the
+async engine, under concurrent load against a real uvicorn server.
+
+Each request runs one query that waits DB_WAIT_MS inside the database, like
+a round trip to Postgres would (SQLite gets a sleep_ms() SQL function for
+that). A pinger measures how long a trivial request waits meanwhile.
+
+    python benchmarks/db_concurrency.py [--clients 20] [--seconds 5]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, text
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import engine, async_engine
+
+DB_WAIT_MS = 20
+PORT = 8765
+WAIT_QUERY = text(f"SELECT sleep_ms({DB_WAIT_MS})")
+
+for _engine in [engine, async_engine.sync_engine]:
+    @event.listens_for(_engine, "connect")
+    def _add_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or ms)
+
+app = FastAPI()
+
+
+@app.get("/sync")
+async def sync_endpoint():
+    # The old pattern: a blocking session called straight from the event loop
+    with Session(engine) as session:
+        return session.exec(WAIT_QUERY).one()[0]
+
+
+@app.get("/async")
+async def async_endpoint():
+    async with AsyncSession(async_engine) as session:
+        return (await session.exec(WAIT_QUERY)).one()[0]
+
+
+@app.get("/ping")
+async def ping():
+    return 1
+
+
+def percentile(samples: list[float], p: int) -> float:
+    # A starved pinger may only get a request or two through
+    if len(samples) < 2:
+        return samples[0] if samples else float("nan")
+    return statistics.quantiles(samples, n=100)[p - 1]
+
+
+async def load(path: str, clients: int, seconds: float) -> dict:
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        latencies: list[float] = []
+        pings: list[float] = []
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get(path)).raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        async def pinger():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await client.get("/ping")
+                pings.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(pinger(), *(worker() for _ in range(clients)))
+
+    return {
+        "rps": len(latencies) / seconds,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "pings": len(pings),
+        "ping_p50": percentile(pings, 50),
+        "ping_p99": percentile(pings, 99),
+    }
+
+
+async def wait_for_server():
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"http://127.0.0.1:{PORT}/ping")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "db_concurrency:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    try:
+        await wait_for_server()
+        print(f"{args.clients} clients for {args.seconds:.0f}s each, {DB_WAIT_MS} ms DB wait per request (ms)")
+        print(f"{'mode':>6} {'req/s':>7} {'p50':>8} {'p99':>8} {'pings':>6} {'ping p50':>9} {'ping p99':>9}")
+        for mode in ["sync", "async"]:
+            r = await load(f"/{mode}", args.clients, args.seconds)
+            print(
+                f"{mode:>6} {r['rps']:>7.0f} {r['p50']:>8.1f} {r['p99']:>8.1f} "
+                f"{r['pings']:>6} {r['ping_p50']:>9.1f} {r['ping_p99']:>9.1f}"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Feed page latency vs catalogue size, with and without the ix_product_feed*
+indexes. Builds throwaway SQLite databases (1k .. 1M products) and times the
+feed query for the first page, a page deep into the feed and a filtered page.
+
+    python benchmarks/feed_pagination.py [--sizes 1000,10000,100000,1000000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from enum import Enum
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text, tuple_, insert
+from sqlmodel import SQLModel, select
+from app.models import Product, User, ProductStatus, ProductType, ProductVisibility
+from app.services.visibility import apply_visibility
+
+FEED_INDEXES = ["ix_product_feed", "ix_product_feed_type", "ix_product_feed_category", "ix_product_feed_city"]
+PAGE = 20
+RUNS = 50
+
+
+def populate(engine, rows: int):
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(1)
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"email": "seller@x.in", "username": "seller"}])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "title": f"Item {i}", "slug": f"item-{i}", "description": "d", "price": rng.randint(1, 5000),
+                "product_type": rng.choice(list(ProductType)).name,
+                "status": ProductStatus.active.name if rng.random() < 0.9 else ProductStatus.sold.name,
+                "visibility": ProductVisibility.public.name if rng.random() < 0.8 else ProductVisibility.college.name,
+                "created_at": base + timedelta(seconds=i), "is_digital": False,
+                "city": rng.choice(["Mumbai", "Delhi", "Pune", "Chennai"]), "user_id": 1,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Product), batch)
+        conn.execute(text("ANALYZE"))
+
+
+def feed_query(cursor=None, product_type=None):
+    query = select(Product).where(Product.status == ProductStatus.active)
+    if product_type is not None:
+        query = query.where(Product.product_type == product_type)
+    if cursor:
+        created_at, id = cursor
+        query = query.where(tuple_(Product.created_at, Product.id) < tuple_(created_at, id))
+    query = apply_visibility(query, None)
+    return query.order_by(Product.created_at.desc(), Product.id.desc()).limit(PAGE)
+
+
+def time_query(engine, query) -> float:
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            conn.execute(query).all()
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def driver_value(value):
+    # As SQLAlchemy binds them for SQLite: enums by name, datetimes as text
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value
+
+
+def plan(engine, query) -> str:
+    # With real bound parameters: SQLite plans literals differently
+    compiled = query.compile(engine)
+    params = tuple(driver_value(compiled.params[name]) for name in compiled.positiontup)
+    with engine.connect() as conn:
+        return "; ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'indexes':>8} {'first':>9} {'deep':>9} {'filtered':>9}   (median ms, {PAGE} rows/page)")
+    for rows in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{tmp}/feed.db")
+            populate(engine, rows)
+            deep = (datetime(2024, 1, 1) + timedelta(seconds=rows // 2), rows // 2)
+            queries = [feed_query(), feed_query(cursor=deep), feed_query(product_type=ProductType.rent)]
+            for label in ["yes", "no"]:
+                if label == "no":
+                    with engine.begin() as conn:
+                        for name in FEED_INDEXES:
+                            conn.execute(text(f"DROP INDEX {name}"))
+                    # Fresh connections: pysqlite's statement cache would keep the old plans
+                    engine.dispose()
+                timings = [time_query(engine, query) for query in queries]
+                print(f"{rows:>9} {label:>8} " + " ".join(f"{t:>9.2f}" for t in timings))
+                if rows == max(int(s) for s in args.sizes.split(",")):
+                    print(f"          plan: {plan(engine, queries[1])}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
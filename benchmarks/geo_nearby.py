@@ -0,0 +1,110 @@
+"""
+/api/products/nearby candidate search on SQLite: a full scan with haversine
+over every located product, the bounding box alone, and the geohash ranges
++ box the route uses (capped at GEO_MAX_CANDIDATES rows). The points are
+synthetic (1M by default): half clustered around 20 city centres, half
+spread evenly over India.
+
+    python benchmarks/geo_nearby.py [--points 1000000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlmodel import SQLModel, select
+from app.models import Product, User, ProductStatus, ProductType, ProductVisibility
+from app.services import geo
+from app.services.visibility import apply_visibility
+
+RADII = [2, 10, 50]
+QUERIES = 20
+PAGE = 20
+
+
+def populate(engine, points: int):
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(7)
+    centres = [(rng.uniform(10, 32), rng.uniform(70, 90)) for _ in range(20)]
+    created = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"email": "seller@x.in", "username": "seller"}])
+        batch = []
+        for i in range(points):
+            if i % 2:
+                lat, lng = rng.uniform(8, 35), rng.uniform(68, 97)
+            else:
+                clat, clng = rng.choice(centres)
+                lat, lng = clat + rng.gauss(0, 0.15), clng + rng.gauss(0, 0.15)
+            batch.append({
+                "title": f"Item {i}", "slug": f"item-{i}", "description": "d", "price": 1,
+                "product_type": ProductType.sell.name, "status": ProductStatus.active.name,
+                "visibility": ProductVisibility.public.name, "created_at": created, "is_digital": False,
+                "latitude": lat, "longitude": lng, "geohash": geo.geohash_encode(lat, lng), "user_id": 1,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Product), batch)
+        conn.execute(text("ANALYZE"))
+
+
+def candidate_query(mode: str, lat: float, lng: float, radius_km: float):
+    columns = select(Product.id, Product.latitude, Product.longitude)
+    if mode == "scan":
+        query = columns.where(Product.latitude.is_not(None))
+    elif mode == "bbox":
+        min_lat, max_lat, min_lng, max_lng = geo.bounding_box(lat, lng, radius_km)
+        query = columns.where(Product.latitude.between(min_lat, max_lat), Product.longitude.between(min_lng, max_lng))
+    else:
+        query = geo.build_candidate_query(lat, lng, radius_km).limit(geo.GEO_MAX_CANDIDATES)
+    return apply_visibility(query.where(Product.status == ProductStatus.active), None)
+
+
+def run(conn, mode: str, radius_km: float, centres) -> str:
+    samples, candidates = [], 0
+    for lat, lng in centres:
+        started = time.perf_counter()
+        rows = conn.execute(candidate_query(mode, lat, lng, radius_km)).all()
+        distances = geo.haversine_km(lat, lng, [r.latitude for r in rows], [r.longitude for r in rows])
+        sorted((d, r.id) for r, d in zip(rows, distances) if d <= radius_km)[:PAGE]
+        samples.append((time.perf_counter() - started) * 1000)
+        candidates += len(rows)
+    samples.sort()
+    return (
+        f"{mode:>8} {radius_km:>3}km  p50 {samples[len(samples) // 2]:>8.1f} ms  max {samples[-1]:>8.1f} ms"
+        f"  avg candidates {candidates // len(centres)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    centres = [(rng.uniform(10, 32), rng.uniform(70, 90)) for _ in range(QUERIES)]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/geo.db")
+        populate(engine, args.points)
+        print(f"{args.points} points, {QUERIES} queries each, numpy {'on' if geo.numpy else 'off'}")
+        with engine.connect() as conn:
+            for radius_km in RADII:
+                # The full scan doesn't depend on the radius; once is enough
+                for mode in (["scan"] if radius_km == RADII[0] else []) + ["bbox", "geohash"]:
+                    print(run(conn, mode, radius_km, centres))
+            if geo.numpy is not None:
+                geo.numpy = None
+                print("pure Python refine:", run(conn, "geohash", RADII[-1], centres))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
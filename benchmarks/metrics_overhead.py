@@ -0,0 +1,117 @@
+"""
+MetricsMiddleware overhead. First around a bare ASGI app that does nothing
+(200k calls), then through the whole app with an in-process client,
+METRICS_ENABLED toggled between rounds, on "/" and a feed page from a
+throwaway SQLite database.
+
+    python benchmarks/metrics_overhead.py [--calls 200000] [--requests 1000]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+# Measure the middleware, not the limiter or the response cache
+os.environ["RATE_LIMIT_BACKEND"] = "off"
+os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+os.environ["STORAGE_BACKEND"] = "local"
+# The /static mount is relative to the working directory
+os.chdir(_tmp)
+
+import httpx
+from sqlalchemy import insert
+from app.database import engine, create_db_and_tables
+from app.models import Product, User, ProductStatus, ProductType, ProductVisibility
+from app.services import metrics
+from app.services.metrics import MetricsMiddleware
+from main import app
+
+ROUNDS = 3
+PRODUCTS = 200
+
+
+class Route:
+    path = "/api/products/{slug}"
+
+
+async def bare_app(scope, receive, send):
+    # What the router leaves behind for the middleware to label with
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"x" * 2000})
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def send(message):
+    pass
+
+
+async def per_call_us(asgi, calls: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/products/desk"}
+    started = time.perf_counter()
+    for _ in range(calls):
+        await asgi(dict(scope), receive, send)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def middleware_only(calls: int):
+    wrapped = MetricsMiddleware(bare_app)
+    bare = min([await per_call_us(bare_app, calls) for _ in range(ROUNDS)])
+    with_metrics = min([await per_call_us(wrapped, calls) for _ in range(ROUNDS)])
+    print(f"bare ASGI app: {bare:.2f} us, wrapped {with_metrics:.2f} us, overhead {with_metrics - bare:.2f} us/request")
+
+
+def populate():
+    create_db_and_tables()
+    created = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"email": "seller@x.in", "username": "seller"}])
+        conn.execute(insert(Product), [{
+            "title": f"Desk {i}", "slug": f"desk-{i}", "description": "d", "price": 10,
+            "product_type": ProductType.sell.name, "status": ProductStatus.active.name,
+            "visibility": ProductVisibility.public.name, "created_at": created + timedelta(seconds=i),
+            "is_digital": False, "user_id": 1,
+        } for i in range(PRODUCTS)])
+
+
+async def full_stack(path: str, requests: int):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get(path)
+        samples = {False: [], True: []}
+        for _ in range(ROUNDS):
+            for enabled in (False, True):
+                metrics.METRICS_ENABLED = enabled
+                started = time.perf_counter()
+                for _ in range(requests):
+                    await client.get(path)
+                samples[enabled].append((time.perf_counter() - started) / requests * 1e6)
+        off, on = min(samples[False]), min(samples[True])
+        print(f"{path:>26}: off {off:8.1f} us  on {on:8.1f} us  overhead {on - off:6.1f} us ({(on - off) / off * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(middleware_only(args.calls))
+    populate()
+    asyncio.run(full_stack("/", args.requests * 5))
+    asyncio.run(full_stack("/api/products/?limit=20", args.requests))
+
+
+if __name__ == "__main__":
+    main()
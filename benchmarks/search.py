@@ -0,0 +1,106 @@
+"""
+/api/products/search query: FTS5 index vs the `%q%` ILIKE scan, on a
+synthetic marketplace corpus in throwaway SQLite databases.
+
+    python benchmarks/search.py [--sizes 10000,100000,500000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlmodel import SQLModel
+from app.models import Product, User, ProductStatus, ProductType, ProductVisibility
+from app.services.search import install_search_index, build_search_query, search_terms
+
+ITEMS = [
+    "laptop", "bicycle", "calculator", "textbook", "guitar", "mattress", "kettle", "chair", "desk", "lamp",
+    "headphones", "monitor", "keyboard", "backpack", "cooler", "fridge", "printer", "camera", "jacket", "shoes",
+]
+ADJECTIVES = ["used", "new", "cheap", "portable", "wooden", "electric", "foldable", "second", "hand", "mint"]
+FILLER = [
+    "condition", "pickup", "hostel", "campus", "semester", "urgent", "sale", "price", "negotiable", "barely",
+    "working", "perfect", "original", "bill", "warranty", "box", "charger", "included", "scratches", "month",
+]
+# Long tail: rare made-up words, so some queries match only a handful of rows
+RARE = [f"{a}{b}{c}" for a in "bdfgkmpstv" for b in "aeiou" for c in ["lor", "nex", "vik", "ram", "tup"]]
+
+QUERIES = ["laptop", "study desk", "electric kett", "guitar used", "kenex", "sutup hostel"]
+RUNS = 20
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    out = []
+    for _ in range(words):
+        pool = rng.choices([ITEMS, ADJECTIVES, FILLER, RARE], weights=[3, 3, 6, 1])[0]
+        out.append(rng.choice(pool))
+    return " ".join(out)
+
+
+def populate(engine, rows: int):
+    SQLModel.metadata.create_all(engine)
+    install_search_index(engine)
+    rng = random.Random(1)
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"email": "seller@x.in", "username": "seller"}])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "title": f"{rng.choice(ADJECTIVES)} {rng.choice(ITEMS)} {rng.choice(FILLER)}",
+                "slug": f"item-{i}", "description": sentence(rng, rng.randint(15, 40)), "price": rng.randint(1, 5000),
+                "product_type": ProductType.sell.name, "status": ProductStatus.active.name,
+                "visibility": ProductVisibility.public.name, "created_at": base + timedelta(seconds=i),
+                "is_digital": False, "user_id": 1,
+            })
+            if len(batch) == 20_000:
+                conn.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Product), batch)
+
+
+def time_query(engine, query) -> tuple[float, int]:
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            rows = conn.execute(query).all()
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    args = parser.parse_args()
+
+    print(f"median ms over {RUNS} runs, first 20 results (hits in brackets)")
+    print(f"{'rows':>8} {'query':>15} {'fts5':>14} {'ilike':>14}")
+    for rows in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{tmp}/search.db")
+            populate(engine, rows)
+            with engine.connect() as conn:
+                conn.execute(text("ANALYZE"))
+            for q in QUERIES:
+                terms = search_terms(q)
+                results = []
+                # "other" is build_search_query's ILIKE fallback
+                for dialect in ["sqlite", "other"]:
+                    query = build_search_query(dialect, terms).where(Product.status == ProductStatus.active).limit(20)
+                    ms, hits = time_query(engine, query)
+                    results.append(f"{ms:>8.2f} [{hits:>2}]")
+                print(f"{rows:>8} {q:>15} " + " ".join(f"{r:>14}" for r in results))
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Product list serialization: FastAPI's default response_model path vs the
+FastJSON modes ("adapter": pydantic TypeAdapter, "projection": attribute
+projection + orjson). Products are in-memory ORM objects with 3 images, a
+category and a user with a college, like the feed returns them. Reports
+time per call and peak traced allocation (tracemalloc).
+
+    python benchmarks/serialization.py [--sizes 100,1000,10000]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The routers import app.database; nothing is queried
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.models import Product, ProductImage, Category, User, College
+from app.routers.products import ProductRead
+from app.services.serialization import FastJSON
+
+# Calls per size: enough for a stable time without waiting minutes at 10k
+CALL_ITEMS = 2000
+
+field = create_model_field(name="response", type_=List[ProductRead], mode="serialization")
+adapter_json = FastJSON(List[ProductRead], mode="adapter")
+projection_json = FastJSON(List[ProductRead], mode="projection")
+
+
+def make_products(n: int) -> list[Product]:
+    college = College(id=1, name="IIT Bombay", slug="iitb", city="Mumbai")
+    category = Category(id=1, name="Furniture", slug="furniture")
+    products = []
+    for i in range(n):
+        user = User(id=i, name="Alice", username=f"a{i}", email=f"a{i}@x.in", picture="https://x/p.jpg")
+        user.college = college
+        product = Product(
+            id=i, title=f"Desk {i}", slug=f"desk-{i}", description="A sturdy desk " * 5, price=10.0,
+            product_type="sell", status="active", visibility="public", created_at=datetime.utcnow(),
+            is_digital=False, city="Mumbai", user_id=i, category_id=1,
+        )
+        product.images = [
+            ProductImage(
+                id=i * 3 + k, url=f"/u/{i}_{k}.webp", card_url=f"/u/{i}_{k}_card.webp",
+                thumb_url=f"/u/{i}_{k}_thumb.webp", product_id=i,
+            )
+            for k in range(3)
+        ]
+        product.category = category
+        product.user = user
+        products.append(product)
+    return products
+
+
+def fastapi_default(products) -> bytes:
+    # What a route with response_model=List[ProductRead] did: validate, then JSONResponse
+    content = asyncio.run(serialize_response(field=field, response_content=products, is_coroutine=True))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+METHODS = {
+    "FastAPI default": fastapi_default,
+    "TypeAdapter": adapter_json.dumps,
+    "projection+orjson": projection_json.dumps,
+}
+
+
+def measure(fn, products) -> tuple[float, float]:
+    fn(products[:10])
+    calls = max(1, CALL_ITEMS // len(products))
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn(products)
+    ms = (time.perf_counter() - started) / calls * 1000
+
+    tracemalloc.start()
+    fn(products)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    args = parser.parse_args()
+
+    sample = make_products(50)
+    outputs = [json.loads(fn(sample)) for fn in METHODS.values()]
+    print("outputs identical:", all(out == outputs[0] for out in outputs))
+
+    print(f"{'items':>6} " + " ".join(f"{name:>22}" for name in METHODS))
+    for n in [int(s) for s in args.sizes.split(",")]:
+        products = make_products(n)
+        cells = []
+        for fn in METHODS.values():
+            ms, mb = measure(fn, products)
+            cells.append(f"{ms:>9.1f} ms / {mb:>5.1f} MB")
+        print(f"{n:>6} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
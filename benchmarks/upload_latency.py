@@ -0,0 +1,127 @@
+"""
+Latency of catalogue GETs while image uploads are in flight, with Pillow
+running in the image process pool vs inline on the event loop (the old
+behaviour). Runs the app in-process against a throwaway SQLite database.
+
+    python benchmarks/upload_latency.py [--readers 8] [--uploads 6] [--files 5]
+"""
+import os
+import io
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+import httpx
+from PIL import Image
+
+
+def noisy_jpeg(size=(3000, 2000)) -> bytes:
+    # Upscaled random pixels: a unique upload each time (no dedupe hit) that
+    # still fits the 5MB limit
+    small = Image.frombytes("RGB", (size[0] // 10, size[1] // 10), os.urandom(size[0] * size[1] * 3 // 100))
+    out = io.BytesIO()
+    small.resize(size, Image.Resampling.BICUBIC).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def percentile(samples: list[float], p: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(p) - 1] if len(samples) > 1 else samples[0]
+
+
+async def run(mode: str, readers: int, uploads: int, files: int) -> dict:
+    from main import app
+    from app.auth import create_access_token
+    from app.database import engine
+    from app.models import User
+    from app.services.image_executor import image_executor
+    from sqlmodel import Session
+
+    if mode == "inline":
+        original_run = image_executor.run
+
+        async def inline(fn, *args):
+            return fn(*args)
+        image_executor.run = inline
+
+    with Session(engine) as session:
+        user = User(email=f"{mode}@bench.in", username=f"bench-{mode}")
+        session.add(user)
+        session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+    payloads = [[noisy_jpeg() for _ in range(files)] for _ in range(uploads)]
+    latencies: list[float] = []
+    stop = asyncio.Event()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def reader():
+            while not stop.is_set():
+                started = time.perf_counter()
+                await client.get("/api/products/", params={"limit": 20})
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        async def upload(images: list[bytes]):
+            response = await client.post(
+                "/api/products/",
+                data={"title": "Bench desk", "description": "d", "product_type": "sell", "price": "10"},
+                files=[("files", (f"{i}.jpg", data, "image/jpeg")) for i, data in enumerate(images)],
+                headers=headers,
+            )
+            assert response.status_code == 200, response.text
+
+        # Warm the pool so worker start-up isn't counted
+        if mode == "pool":
+            await upload([noisy_jpeg((64, 64))])
+
+        tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+        started = time.perf_counter()
+        # One upload after another: inline, concurrent uploads on SQLite run
+        # into the 5s busy timeout while Pillow blocks the loop mid-transaction
+        for images in payloads:
+            await upload(images)
+        upload_seconds = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*tasks)
+
+    if mode == "inline":
+        image_executor.run = original_run
+    return {
+        "gets": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "uploads_s": upload_seconds,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--uploads", type=int, default=6)
+    parser.add_argument("--files", type=int, default=5)
+    args = parser.parse_args()
+
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        print(f"{args.readers} readers, {args.uploads} uploads x {args.files} images (3000x2000 JPEG)")
+        print(f"{'mode':>7} {'GETs':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'uploads s':>10}")
+        for mode in ["inline", "pool"]:
+            r = await run(mode, args.readers, args.uploads, args.files)
+            print(f"{mode:>7} {r['gets']:>6} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['max']:>8.1f} {r['uploads_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
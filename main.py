@@ -1,7 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import create_db_and_tables
-from app.routers import auth, users, colleges, products
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import create_db_and_tables, async_engine, replica_router
+from app.services.college_index import college_index
+from app.services.image_executor import image_executor
+from app.services.otp_queue import otp_queue
+from app.services.otp_purge import otp_purge
+from app.services.metrics import MetricsMiddleware, render_metrics
+from app.services.query_profiler import QueryProfilerMiddleware
+from app.routers import auth, users, colleges, products, images, internal
 from fastapi.staticfiles import StaticFiles
 
 app = FastAPI()
@@ -20,19 +27,46 @@ app.add_middleware(
     allow_credentials=True,           # Allows cookies/auth headers
     allow_methods=["*"],              # Allows POST, GET, OPTIONS, etc.
     allow_headers=["*"],              # Allows Authorization, Content-Type, etc.
+    expose_headers=["X-Next-Cursor", "Retry-After"], # Feed cursor, rate limit backoff
 )
 
+# SQL profiling (SQL_PROFILE=true / tests), inside the metrics middleware
+app.add_middleware(QueryProfilerMiddleware)
+
+# Outermost, so its timings include CORS and everything below it
+app.add_middleware(MetricsMiddleware)
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(colleges.router)
 app.include_router(products.router)
+app.include_router(images.router)
+app.include_router(internal.router)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables()
+    async with AsyncSession(async_engine) as session:
+        await college_index.load(session)
+    await otp_queue.start()
+    await otp_purge.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    image_executor.shutdown()
+    await otp_queue.stop()
+    await otp_purge.stop()
+    await async_engine.dispose()
+    await replica_router.dispose()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus scrape target; keep it off the public load balancer
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Config is read at import time: set it up before anything imports app.*
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["RATE_LIMIT_BACKEND"] = "off"
+os.environ["STORAGE_BACKEND"] = "local"
+# Every request runs its real queries
+os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+# Local storage and the /static mount are relative to the working directory
+os.chdir(_tmp.name)
+
+pytest_plugins = ["app.testing"]
+
+
+def fake_google_token(credential: str) -> dict:
+    # Tests log in with the email as the "credential"
+    return {"email": credential, "name": credential.split("@")[0].title(), "picture": None}
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import app.routers.auth as auth_router
+    from main import app
+
+    auth_router.verify_google_token = fake_google_token
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def login(client):
+    def login(email: str) -> dict:
+        response = client.post("/api/auth/google", json={"credential": email})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login
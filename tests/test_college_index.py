@@ -0,0 +1,94 @@
+import time
+import random
+import string
+import asyncio
+import pytest
+from types import SimpleNamespace
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import College
+from app.services import college_index
+from app.services.college_index import CollegeIndex, tokenize
+
+WORDS = ["Institute", "Technology", "College", "Engineering", "National", "Indian", "Saint", "St.", "Science", "Insti"]
+CITIES = ["Mumbai", "Pune", "Indore", "Surat", None]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def college(cid: int, name: str, city: str | None = None):
+    return SimpleNamespace(
+        id=cid, name=name, slug=f"c{cid}", domain=None, city=city, logo_url=None,
+        address=None, district=None, state=None, country="India",
+    )
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = random.Random(7)
+    colleges = []
+    for cid in range(1, 5001):
+        words = rng.sample(WORDS, rng.randint(1, 4)) + ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 6)))]
+        colleges.append(college(cid, " ".join(words), rng.choice(CITIES)))
+    return CollegeIndex._build(colleges)
+
+
+def prefix_queries() -> list[str]:
+    rng = random.Random(3)
+    queries = ["i", "in", "s", "st", "tech", "indian inst", "inst in", "s in", "pune", "eng mum"]
+    for _ in range(60):
+        terms = ["".join(rng.choices("aceimnpstu", k=rng.randint(1, 3))) for _ in range(rng.randint(1, 2))]
+        queries.append(" ".join(terms))
+    return queries
+
+
+@pytest.mark.parametrize("full_score_max", [0, college_index.FULL_SCORE_MAX_CANDIDATES])
+@pytest.mark.parametrize("q", prefix_queries())
+def test_prefix_ranking_is_exact(index, q, full_score_max, monkeypatch):
+    # Same scores as ranking every prefix match (ids may differ on ties),
+    # through the ranked walk (0) and through scoring a whole small range
+    monkeypatch.setattr(college_index, "FULL_SCORE_MAX_CANDIDATES", full_score_max)
+    terms = tokenize(q)
+    q = " ".join(terms)
+    expected = sorted(index._score_prefix(cid, q, terms) for cid in index._colleges if index._matches(cid, terms))[:10]
+    ranked = index._prefix_ranked(q, terms, limit=10)
+
+    assert [index._score_prefix(cid, q, terms) for cid in ranked] == expected
+
+
+def test_typos_still_match(index):
+    index.add(college(50_000, "Indian Institute of Technology Bombay", "Mumbai"))
+    assert index.search("technolgy bomby")[0].name == "Indian Institute of Technology Bombay"
+
+
+@pytest.mark.anyio
+async def test_add_during_load_is_kept(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/colleges.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add(College(name="Old College", slug="old-college", city="Pune"))
+        await session.commit()
+
+    build = CollegeIndex._build
+
+    def slow_build(colleges):
+        time.sleep(0.2)
+        return build(colleges)
+
+    monkeypatch.setattr(CollegeIndex, "_build", staticmethod(slow_build))
+    index = CollegeIndex()
+    async with AsyncSession(engine) as session:
+        loading = asyncio.create_task(index.load(session))
+        await asyncio.sleep(0.05)
+        # create_college on this worker while the rebuild reads / builds
+        index.add(college(99, "Brand New College", "Pune"))
+        await loading
+
+    assert [c.name for c in index.search("brand")] == ["Brand New College"]
+    assert [c.name for c in index.search("old")] == ["Old College"]
+    await engine.dispose()
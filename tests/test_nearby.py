@@ -0,0 +1,62 @@
+"""/api/products/nearby on the geohash path, and the geohash column upgrade."""
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import SQLModel
+from app.database import upgrade_schema
+from app.routers import products
+from app.services.geo import install_geo_index, geohash_encode
+
+LAT, LNG = -33.9, 18.4
+# Degrees north (south if negative) of (LAT, LNG): neither insertion nor
+# geohash (~latitude) order is distance order
+OFFSETS = [0.2, 0.04, -0.03, 0.02, -0.01]
+
+
+def test_nearest_first_within_the_radius(client, login, monkeypatch):
+    owner = login("nearby-owner@x.in")
+    for offset in OFFSETS:
+        response = client.post(
+            "/api/products/",
+            data={
+                "title": f"Nearby lamp {offset}", "description": "d", "product_type": "sell", "price": "5",
+                "latitude": str(LAT + offset), "longitude": str(LNG),
+            },
+            headers=owner,
+        )
+        assert response.status_code == 200, response.text
+
+    def nearby() -> list[tuple[str, float]]:
+        response = client.get("/api/products/nearby", params={"lat": LAT, "lng": LNG, "radius_km": 10})
+        assert response.status_code == 200, response.text
+        return [(p["title"], p["distance_km"]) for p in response.json()]
+
+    results = nearby()
+    # 0.2 degrees is ~22km out
+    assert [title for title, _ in results] == [f"Nearby lamp {o}" for o in [-0.01, 0.02, -0.03, 0.04]]
+    assert 1.0 < results[0][1] < 1.2
+
+    # The candidate cap keeps the nearest rows, not whichever the index yields first
+    monkeypatch.setattr(products, "GEO_MAX_CANDIDATES", 2)
+    assert [title for title, _ in nearby()] == ["Nearby lamp -0.01", "Nearby lamp 0.02"]
+
+
+def test_upgrade_adds_and_backfills_geohash(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    SQLModel.metadata.create_all(engine)
+    # A database from before nearby search
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_product_geo"))
+        conn.execute(text("ALTER TABLE product DROP COLUMN geohash"))
+        conn.execute(text("INSERT INTO user (email, username, is_phone_verified, is_college_verified) VALUES ('a', 'a', 0, 0)"))
+        conn.execute(text(
+            "INSERT INTO product (title, slug, description, price, product_type, status, visibility, created_at, "
+            "is_digital, latitude, longitude, user_id) "
+            "VALUES ('t', 't', 'd', 1, 'sell', 'active', 'public', '2024-01-01', 0, :lat, :lng, 1)"
+        ), {"lat": LAT, "lng": LNG})
+
+    upgrade_schema(engine)
+    install_geo_index(engine)
+
+    assert "ix_product_geo" in {index["name"] for index in inspect(engine).get_indexes("product")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT geohash FROM product")).scalar_one() == geohash_encode(LAT, LNG)
+    engine.dispose()
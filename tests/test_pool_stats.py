@@ -0,0 +1,63 @@
+"""Pool counters behind /internal/db/pool and the db_pool_* series in /metrics."""
+import asyncio
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.database import ReplicaRouter, TimedQueuePool, instrument_pool
+from app.services.metrics import render_metrics
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def metric(name: str, pool: str) -> float:
+    body, _ = render_metrics()
+    prefix = f'{name}{{pool="{pool}"}} '
+    for line in body.decode().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    raise AssertionError(f"{prefix!r} not in /metrics")
+
+
+@pytest.mark.anyio
+async def test_waits_and_checkouts(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=1, max_overflow=0,
+    )
+    stats = instrument_pool(engine.sync_engine, "test-pool")
+
+    async def query(hold: float = 0.0):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(hold)
+
+    # The second checkout waits for the only connection
+    await asyncio.gather(query(hold=0.1), query())
+    snapshot = stats.snapshot(engine.sync_engine.pool)
+    assert snapshot["checkouts"] == 2
+    assert snapshot["checked_out"] == 0
+    assert snapshot["wait_ms_max"] >= 50
+    assert metric("db_pool_checkouts_total", "test-pool") == 2
+    assert metric("db_pool_checked_out", "test-pool") == 0
+    assert metric("db_pool_wait_seconds_count", "test-pool") == 2
+
+    # dispose() replaces the pool; it keeps reporting into the same stats
+    await engine.dispose()
+    await query()
+    assert stats.snapshot(engine.sync_engine.pool)["checkouts"] == 3
+    assert stats.waits == 3
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_replica_pools_are_instrumented(tmp_path):
+    router = ReplicaRouter([f"sqlite:///{tmp_path}/replica.db"])
+    async with router.replicas[0].connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    assert [stats.name for stats in router.pool_stats] == ["replica0"]
+    assert router.pool_stats[0].checkouts == 1
+    assert metric("db_pool_checkouts_total", "replica0") >= 1
+    await router.dispose()
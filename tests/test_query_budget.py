@@ -0,0 +1,70 @@
+"""
+Statement budgets for the hot routes. Listings come from several sellers so
+a per-row lazy load would show up as a repeated statement (N+1), and the
+budgets don't depend on how many rows come back.
+"""
+import pytest
+
+SELLERS = 4
+LISTINGS_PER_SELLER = 3
+
+
+@pytest.fixture(scope="module")
+def seller(client, login):
+    headers = None
+    for n in range(SELLERS):
+        headers = login(f"seller{n}@budget.in")
+        for i in range(LISTINGS_PER_SELLER):
+            response = client.post(
+                "/api/products/",
+                data={"title": f"Budget desk {n}-{i}", "description": "d", "product_type": "sell", "price": "10"},
+                headers=headers,
+            )
+            assert response.status_code == 200, response.text
+    return headers
+
+
+def test_feed_guest(client, seller, query_budget):
+    with query_budget(max_queries=5):
+        response = client.get("/api/products/", params={"limit": 50})
+    assert response.status_code == 200
+    assert len(response.json()) >= SELLERS * LISTINGS_PER_SELLER
+
+
+def test_feed_logged_in(client, seller, query_budget):
+    # + the viewer's snapshot (user, college, has_listings)
+    with query_budget(max_queries=8):
+        response = client.get("/api/products/", params={"limit": 50}, headers=seller)
+    assert response.status_code == 200
+
+
+def test_product_detail(client, seller, query_budget):
+    with query_budget(max_queries=5):
+        response = client.get("/api/products/budget-desk-0-0")
+    assert response.status_code == 200
+
+
+def test_own_profile(client, seller, query_budget):
+    with query_budget(max_queries=5):
+        response = client.get("/api/users/me", headers=seller)
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == LISTINGS_PER_SELLER
+
+
+def test_public_profile(client, seller, query_budget):
+    with query_budget(max_queries=2):
+        response = client.get("/api/u/seller0")
+    assert response.status_code == 200
+
+
+def test_login_existing_user(client, seller, query_budget):
+    with query_budget(max_queries=1):
+        response = client.post("/api/auth/google", json={"credential": "seller0@budget.in"})
+    assert response.status_code == 200
+
+
+def test_login_new_user(client, query_budget):
+    # Lookup, college domain, unique username, insert
+    with query_budget(max_queries=6):
+        response = client.post("/api/auth/google", json={"credential": "newcomer@budget.in"})
+    assert response.status_code == 200
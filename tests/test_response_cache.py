@@ -0,0 +1,166 @@
+"""
+Response cache with the memory backend: singleflight, errors and
+cancellation, viewer segments and invalidation. (conftest turns the cache
+off for everything else.)
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.services.auth_cache import UserSnapshot
+from app.services.response_cache import CachedResponse, MemoryBackend, ResponseCache, response_cache, viewer_segment
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(MemoryBackend(max_bytes=1024 * 1024, ttl=60))
+
+
+class SlowBuild:
+    """build() for get_or_build: counts calls and waits for `release`."""
+
+    def __init__(self, error: BaseException | None = None):
+        self.calls = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> CachedResponse:
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return CachedResponse(b'{"ok": true}')
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_build(cache):
+    build = SlowBuild()
+    tasks = [asyncio.create_task(cache.get_or_build("feed", build)) for _ in range(10)]
+    await settle()
+    build.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert build.calls == 1
+    assert {result.body for result in results} == {b'{"ok": true}'}
+    assert cache.stats()["coalesced"] == 9
+    # And it's cached now
+    assert (await cache.get_or_build("feed", SlowBuild())).body == b'{"ok": true}'
+
+
+@pytest.mark.anyio
+async def test_errors_reach_waiters_and_are_not_cached(cache):
+    build = SlowBuild(HTTPException(status_code=404))
+    tasks = [asyncio.create_task(cache.get_or_build("missing", build)) for _ in range(3)]
+    await settle()
+    build.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert build.calls == 1
+    assert all(isinstance(result, HTTPException) and result.status_code == 404 for result in results)
+    retry = SlowBuild()
+    retry.release.set()
+    await cache.get_or_build("missing", retry)
+    assert retry.calls == 1
+
+
+@pytest.mark.anyio
+async def test_cancelled_leader_does_not_cancel_waiters(cache):
+    build = SlowBuild()
+    leader = asyncio.create_task(cache.get_or_build("feed", build))
+    await settle()
+    waiters = [asyncio.create_task(cache.get_or_build("feed", build)) for _ in range(3)]
+    await settle()
+
+    leader.cancel()
+    await settle()
+    build.release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert leader.cancelled()
+    assert {result.body for result in results} == {b'{"ok": true}'}
+    # One waiter took over the build, the others joined it
+    assert build.calls == 2
+
+
+@pytest.mark.anyio
+async def test_invalidate_forces_a_rebuild(cache):
+    first = SlowBuild()
+    first.release.set()
+    await cache.get_or_build("feed", first)
+    await cache.invalidate()
+
+    second = SlowBuild()
+    second.release.set()
+    await cache.get_or_build("feed", second)
+    assert second.calls == 1
+
+
+def snapshot(id: int, college_slug=None, gender=None, college_city=None, has_listings=False) -> UserSnapshot:
+    return UserSnapshot(
+        id=id, username=f"u{id}", college_slug=college_slug, gender=gender,
+        college_city=college_city, has_listings=has_listings,
+    )
+
+
+def test_viewer_segments():
+    a = snapshot(1, "iit-b", "female", "Mumbai")
+    same = snapshot(2, "iit-b", "female", "mumbai")
+
+    assert viewer_segment(None) == "guest"
+    assert viewer_segment(a) == viewer_segment(same)
+    assert viewer_segment(a) != viewer_segment(snapshot(3, "iit-d", "female", "Mumbai"))
+    assert viewer_segment(a) != viewer_segment(snapshot(4, "iit-b", "male", "Mumbai"))
+    assert viewer_segment(a) != viewer_segment(None)
+    # Owners see their own listings whatever the visibility: a segment each
+    assert viewer_segment(snapshot(5, "iit-b", "female", "Mumbai", has_listings=True)) == "user:5"
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    # The app's singleton, as imported by every router
+    monkeypatch.setattr(response_cache, "backend", MemoryBackend(max_bytes=16 * 1024 * 1024, ttl=60))
+    return response_cache
+
+
+def test_feed_is_cached_per_segment_and_invalidated_by_writes(client, login, memory_cache, query_budget):
+    owner = login("cache-owner@x.in")
+    response = client.post(
+        "/api/products/",
+        data={"title": "Cache lamp", "description": "d", "product_type": "sell", "price": "5", "visibility": "college"},
+        headers=owner,
+    )
+    assert response.status_code == 200, response.text
+    slug = response.json()["slug"]
+
+    def feed_slugs(headers=None) -> set[str]:
+        response = client.get("/api/products/", params={"limit": 100}, headers=headers or {})
+        assert response.status_code == 200
+        return {product["slug"] for product in response.json()}
+
+    # Guests never see the college-only listing; its owner does, even right
+    # after a guest page was cached
+    assert slug not in feed_slugs()
+    assert slug in feed_slugs(owner)
+
+    # Repeat guest read: a hit, only the catalogue version is queried
+    hits = memory_cache.hits
+    with query_budget(max_queries=1):
+        assert slug not in feed_slugs()
+    assert memory_cache.hits == hits + 1
+
+    # A new public listing invalidates the cached guest page
+    response = client.post(
+        "/api/products/",
+        data={"title": "Cache chair", "description": "d", "product_type": "sell", "price": "5"},
+        headers=owner,
+    )
+    assert response.json()["slug"] in feed_slugs()
@@ -0,0 +1,86 @@
+"""S3Storage against moto's in-process S3."""
+import time
+import pytest
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "test-images"
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_BUCKET", BUCKET)
+    monkeypatch.setenv("S3_REGION", "us-east-1")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+    monkeypatch.delenv("S3_PUBLIC_URL", raising=False)
+    # S3's smallest multipart part is 5MB
+    monkeypatch.setenv("S3_MULTIPART_THRESHOLD", str(5 * MB))
+    monkeypatch.setenv("S3_MULTIPART_CHUNKSIZE", str(5 * MB))
+
+    from app.services.storage import S3Storage
+
+    with moto.mock_aws():
+        storage = S3Storage()
+        storage.client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+def head(storage, name: str) -> dict:
+    return storage.client.head_object(Bucket=BUCKET, Key=storage._key(name))
+
+
+def test_put_get_exists(s3):
+    assert not s3.exists("ab/abc.webp")
+    assert s3.get("ab/abc.webp") is None
+
+    s3.put("ab/abc.webp", b"webp bytes")
+    assert s3.exists("ab/abc.webp")
+    assert s3.get("ab/abc.webp") == b"webp bytes"
+
+    meta = head(s3, "ab/abc.webp")
+    assert meta["ContentType"] == "image/webp"
+    assert meta["CacheControl"] == "public, max-age=31536000, immutable"
+
+
+def test_keys_and_urls_use_the_prefix(s3):
+    s3.put("ab/abc.webp", b"x")
+    keys = [obj["Key"] for obj in s3.client.list_objects_v2(Bucket=BUCKET)["Contents"]]
+    assert keys == ["uploads/products/ab/abc.webp"]
+    assert s3.url("ab/abc.webp") == f"https://{BUCKET}.s3.us-east-1.amazonaws.com/uploads/products/ab/abc.webp"
+
+
+def test_large_objects_go_up_as_multipart(s3):
+    data = bytes(11 * MB)
+    s3.put("big.webp", data)
+    assert s3.get("big.webp") == data
+    # Multipart ETags end in -<parts>
+    assert head(s3, "big.webp")["ETag"].strip('"').endswith("-3")
+
+
+def test_touch_bumps_last_modified_and_keeps_headers(s3):
+    s3.put("ab/abc.webp", b"x")
+    before = dict(s3.list())["ab/abc.webp"]
+    time.sleep(1.1)  # LastModified has second resolution
+
+    assert s3.touch("ab/abc.webp")
+    assert dict(s3.list())["ab/abc.webp"] > before
+    meta = head(s3, "ab/abc.webp")
+    assert meta["ContentType"] == "image/webp"
+    assert meta["CacheControl"] == "public, max-age=31536000, immutable"
+    assert s3.get("ab/abc.webp") == b"x"
+
+    assert not s3.touch("ab/missing.webp")
+
+
+def test_list_and_delete(s3):
+    names = [f"{i:02x}/blob{i}.webp" for i in range(3)]
+    for name in names:
+        s3.put(name, b"x")
+
+    assert sorted(name for name, _ in s3.list()) == names
+    s3.delete(names[0])
+    assert not s3.exists(names[0])
+    assert sorted(name for name, _ in s3.list()) == names[1:]
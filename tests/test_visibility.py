@@ -0,0 +1,130 @@
+"""
+The feed and product detail filter in SQL (apply_visibility);
+check_visibility is the reference. A seeded random population of owners,
+products and viewers (college, the college's city, gender, verification)
+must get exactly what check_visibility allows, from the whole feed and
+slug by slug from the detail route (200, else 403 logged in / 404 guest).
+"""
+import random
+import pytest
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+SEED = 20240601
+OWNERS = 10
+VIEWERS = 14
+# Detail requests per viewer, a random sample of the products
+DETAIL_SAMPLE = 40
+
+COLLEGES = {
+    # slug: city. "pune" vs "Pune" checks the case-insensitive match
+    "vis-college-a": "Pune",
+    "vis-college-b": "Mumbai",
+    "vis-college-c": "pune",
+    "vis-college-d": None,
+}
+GENDERS = ["female", "male", None]
+# A product's own city; empty / missing falls back to the owner's college city
+PRODUCT_CITIES = ["Pune", "PUNE", "Mumbai", "Delhi", "", None]
+
+
+def random_profile(rng: random.Random) -> dict:
+    return {
+        "college_slug": rng.choice([*COLLEGES, None]),
+        "gender": rng.choice(GENDERS),
+        "is_college_verified": rng.random() < 0.5,
+    }
+
+
+@pytest.fixture(scope="module")
+def population(client):
+    from app.auth import create_access_token
+    from app.database import engine
+    from app.models import College, User, Product, ProductType, ProductStatus, ProductVisibility
+
+    rng = random.Random(SEED)
+    with Session(engine) as session:
+        session.add_all([College(name=slug, slug=slug, city=city) for slug, city in COLLEGES.items()])
+        owners = [User(email=f"vis-owner-{n}@vis.in", username=f"vis-owner-{n}", **random_profile(rng)) for n in range(OWNERS)]
+        viewers = [User(email=f"vis-viewer-{n}@vis.in", username=f"vis-viewer-{n}", **random_profile(rng)) for n in range(VIEWERS)]
+        session.add_all(owners + viewers)
+        session.flush()
+
+        for owner in owners:
+            for visibility in ProductVisibility:
+                for _ in range(2):
+                    session.add(Product(
+                        title="Vis", slug=f"vis-{owner.id}-{visibility.value}-{rng.getrandbits(32):x}",
+                        description="d", price=1, product_type=ProductType.sell, status=ProductStatus.active,
+                        visibility=visibility, city=rng.choice(PRODUCT_CITIES), user_id=owner.id,
+                    ))
+        session.commit()
+
+        # Guests, the random viewers and a few owners (who always see their own)
+        tokens = [None] + [create_access_token({"user_id": user.id}) for user in viewers + owners[:3]]
+    return tokens
+
+
+def expected_slugs(token: str | None) -> dict[str, bool]:
+    """slug -> check_visibility() for every vis- product."""
+    from app.auth import decode_access_token
+    from app.database import engine
+    from app.models import Product, User
+    from app.routers.products import check_visibility
+    from app.services.auth_cache import UserSnapshot
+
+    with Session(engine) as session:
+        viewer = None
+        if token:
+            user = session.exec(
+                select(User).where(User.id == decode_access_token(token)["user_id"]).options(selectinload(User.college))
+            ).one()
+            viewer = UserSnapshot.from_user(user)
+        products = session.exec(
+            select(Product)
+            .where(Product.slug.startswith("vis-"))
+            .options(selectinload(Product.user).selectinload(User.college))
+        ).all()
+        return {product.slug: check_visibility(product, viewer) for product in products}
+
+
+def auth(token: str | None) -> dict:
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def feed_slugs(client, token: str | None) -> set[str]:
+    slugs, params = set(), {"limit": 100}
+    while True:
+        response = client.get("/api/products/", params=params, headers=auth(token))
+        assert response.status_code == 200
+        slugs |= {product["slug"] for product in response.json() if product["slug"].startswith("vis-")}
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return slugs
+        params = {"limit": 100, "cursor": cursor}
+
+
+@pytest.mark.parametrize("viewer", range(1 + VIEWERS + 3))
+def test_feed_matches_check_visibility(client, population, viewer):
+    token = population[viewer]
+    expected = expected_slugs(token)
+
+    assert feed_slugs(client, token) == {slug for slug, visible in expected.items() if visible}
+
+
+@pytest.mark.parametrize("viewer", range(1 + VIEWERS + 3))
+def test_detail_matches_check_visibility(client, population, viewer):
+    token = population[viewer]
+    expected = expected_slugs(token)
+    sample = random.Random(SEED + viewer).sample(sorted(expected), DETAIL_SAMPLE)
+
+    for slug in sample:
+        response = client.get(f"/api/products/{slug}", headers=auth(token))
+        if expected[slug]:
+            assert response.status_code == 200, slug
+            assert response.json()["slug"] == slug
+        else:
+            # Logged-in viewers are told it exists but is restricted
+            assert response.status_code == (403 if token else 404), slug
+
+    assert client.get("/api/products/vis-missing", headers=auth(token)).status_code == 404